@@ -1,106 +1,372 @@
 from flask import Flask, request, jsonify, Response, stream_with_context, send_file
 from flask_cors import CORS
 import os
+import sys
 import json
+import datetime
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from prompts import get_prompt_for_task, BASE_SYSTEM_PROMPT
-from vertexai.generative_models import GenerativeModel, Part
-import vertexai
-import firebase_admin
-from firebase_admin import credentials, firestore
-import tempfile
+from prompts import SYLLABUS_ANALYSIS_PROMPT, SYLLABUS_PROMPT_VERSION, CONVERSATION_SUMMARY_PROMPT, PromptBuilder, sections_for_task
+from werkzeug.exceptions import RequestEntityTooLarge
+from storage import StudentDataStore, UserDataStore
+from cache import LRUCache, MISSING, AnalysisCache, response_cache_key
+from uploads import BufferedUploadRequest, InvalidUpload, read_pdf_upload, DEFAULT_MAX_UPLOAD_BYTES
+from jobs import JobQueue, JobQueueFull
+from scheduler import RequestScheduler
+from grades import GradeEngine
+from events import EventIndex, iter_ics, DEADLINE_TYPES
+from sessions import SessionStore, SessionBacking
+from streaming import sse_stream, SSE_HEADERS
+from responses import RepresentationCache
+from sync import SyncManager, sync_mark, user_document
+from extraction import extract_syllabus, replay_syllabus
+from metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, LLM_TOKENS, RESPONSE_CACHE_LOOKUPS, instrument_app, instrumented, report_error
 
 load_dotenv()
 
+FIRESTORE_BATCH_LIMIT = 500
+REPLAY_CHUNK_SIZE = 80
+CORS_OPTIONS = {"expose_headers": ["X-Analysis-Cache", "X-Request-ID", "ETag"]}
+
+# The Firestore client is created on first use: importing firebase_admin
+# and opening the client cost more than the rest of startup combined.
+# Cached documents are kept with their Firestore update time as a version.
+@instrumented("firestore")
 class FirebaseClient:
-    def __init__(self):
-        firebase_credentials = json.loads(os.getenv("FIREBASE_CREDENTIALS"))
-        cred = credentials.Certificate(firebase_credentials)
-        if not firebase_admin._apps:
-            firebase_admin.initialize_app(cred)
-        self.db = firestore.client()
+    def __init__(self, db=None):
+        self._db = db
+        self._db_lock = threading.Lock()
+        self._local_versions = itertools.count()
+        self.cache = LRUCache(
+            maxsize=int(os.getenv("FIRESTORE_CACHE_SIZE", 1024)),
+            ttl=float(os.getenv("FIRESTORE_CACHE_TTL", 300))
+        )
+    
+    @property
+    def db(self):
+        if self._db is None:
+            with self._db_lock:
+                if self._db is None:
+                    import firebase_admin
+                    from firebase_admin import credentials, firestore
+                    
+                    firebase_credentials = json.loads(os.getenv("FIREBASE_CREDENTIALS"))
+                    cred = credentials.Certificate(firebase_credentials)
+                    if not firebase_admin._apps:
+                        firebase_admin.initialize_app(cred)
+                    self._db = firestore.client()
+        return self._db
+    
+    def _cache_doc(self, email, user_data, update_time):
+        version = sync_mark(update_time)
+        if version is None:
+            # Without an update time, any later cache fill is a new version.
+            version = f"local-{next(self._local_versions)}"
+        entry = (user_data, version)
+        self.cache.set(email, entry)
+        return entry
+    
+    def _get_user_entry(self, email):
+        entry = self.cache.get(email)
+        if entry is MISSING:
+            snapshot = self.db.collection("user-data").document(email).get()
+            entry = self._cache_doc(email, snapshot.to_dict(), snapshot.update_time)
+        return entry
+    
+    def _get_user_doc(self, email):
+        return self._get_user_entry(email)[0]
+    
+    def _update_cached_doc(self, email, user_data, fields, write_result):
+        if user_data is not None:
+            self._cache_doc(email, {**user_data, **fields}, write_result.update_time)
+    
+    def cache_stats(self):
+        return self.cache.stats()
     
     def save_user(self, email, name):
         user_ref = self.db.collection("user-data").document(email)
-        user_ref.set({
+        self.cache.pop(email)
+        write_result = user_ref.set({
             "name": name
         })
+        self._cache_doc(email, {"name": name}, write_result.update_time)
         return {"success": True, "message": f"User {name} saved with email {email}"}
     
     def add_semester(self, email, semester_num, term_name):
         user_ref = self.db.collection("user-data").document(email)
         semester_key = f"semester_{semester_num}"
-        user_ref.update({
-            semester_key: {
-                "term": term_name,
-                "courses": []
-            }
+        semester = {
+            "term": term_name,
+            "courses": []
+        }
+        cached, _ = self.cache.pop(email) or (None, None)
+        write_result = user_ref.update({
+            semester_key: semester
         })
+        self._update_cached_doc(email, cached, {semester_key: semester}, write_result)
         return {"success": True, "message": f"Semester {semester_num} added for {email}"}
     
     def add_courses(self, email, semester_num, courses):
         user_ref = self.db.collection("user-data").document(email)
         semester_key = f"semester_{semester_num}"
         
-        user_data = user_ref.get().to_dict()
+        user_data = self._get_user_doc(email)
         if not user_data or semester_key not in user_data:
             return {"success": False, "message": f"Semester {semester_num} not found for {email}"}
         
-        user_ref.update({
+        self.cache.pop(email)
+        write_result = user_ref.update({
             f"{semester_key}.courses": courses
         })
+        self._update_cached_doc(
+            email, user_data, {semester_key: {**user_data[semester_key], "courses": courses}}, write_result
+        )
         return {"success": True, "message": f"Courses added to semester {semester_num} for {email}"}
     
+    def _plan_user_write(self, user):
+        email = user.get("email")
+        if not email:
+            raise ValueError("Email is required")
+        
+        fields = {}
+        for semester in user.get("semesters", []):
+            semester_num = semester.get("semester_num")
+            if not semester_num:
+                raise ValueError("semester_num is required for every semester")
+            semester_key = f"semester_{semester_num}"
+            courses = semester.get("courses", [])
+            if semester.get("term_name"):
+                fields[semester_key] = {"term": semester["term_name"], "courses": courses}
+            else:
+                fields[f"{semester_key}.courses"] = courses
+        
+        name = user.get("name")
+        if name:
+            if any("." in key for key in fields):
+                raise ValueError("term_name is required for every semester of a new user")
+            return email, "set", {"name": name, **fields}
+        if not fields:
+            raise ValueError("Name or semesters are required")
+        return email, "update", fields
+    
+    def _check_update(self, email, fields, planned):
+        # Firestore rejects updates to a missing document, and would create
+        # a semester that a dotted courses update names, so check both first
+        # (against the cache where possible), as add_courses does. Documents
+        # set earlier in the same bulk write are checked as planned.
+        user_data = planned[email] if email in planned else self._get_user_doc(email)
+        if user_data is None:
+            raise ValueError(f"User {email} not found")
+        for key in fields:
+            semester_key = key.split(".")[0]
+            if "." in key and semester_key not in user_data:
+                raise ValueError(f"Semester {semester_key.split('_', 1)[1]} not found for {email}")
+    
+    def _commit_writes(self, writes):
+        collection = self.db.collection("user-data")
+        batch = self.db.batch()
+        for result, op, data in writes:
+            self.cache.pop(result["email"])
+            user_ref = collection.document(result["email"])
+            if op == "set":
+                batch.set(user_ref, data)
+            else:
+                batch.update(user_ref, data)
+        write_results = batch.commit()
+        
+        for (result, op, data), write_result in zip(writes, write_results):
+            if op == "set":
+                self._cache_doc(result["email"], data, write_result.update_time)
+            result["success"] = True
+            result["message"] = f"{'Saved' if op == 'set' else 'Updated'} user {result['email']}"
+    
+    def bulk_write(self, users):
+        results = []
+        writes = []
+        planned = {}
+        for index, user in enumerate(users):
+            try:
+                email, op, data = self._plan_user_write(user)
+                if op == "update":
+                    self._check_update(email, data, planned)
+                    if email in planned:
+                        planned[email].update((key, None) for key in data if "." not in key)
+                else:
+                    planned[email] = dict(data)
+            except ValueError as e:
+                results.append({"index": index, "email": user.get("email"), "success": False, "message": str(e)})
+                continue
+            result = {"index": index, "email": email, "success": False, "message": ""}
+            results.append(result)
+            writes.append((result, op, data))
+        
+        for start in range(0, len(writes), FIRESTORE_BATCH_LIMIT):
+            chunk = writes[start:start + FIRESTORE_BATCH_LIMIT]
+            try:
+                self._commit_writes(chunk)
+                continue
+            except Exception:
+                pass
+            
+            # A batch is all-or-nothing: retry its writes one by one so each
+            # result reflects what actually happened to that user.
+            for write in chunk:
+                try:
+                    self._commit_writes([write])
+                except Exception as e:
+                    write[0]["message"] = f"Write failed: {str(e)}"
+        
+        return {
+            "success": all(result["success"] for result in results),
+            "written": sum(1 for result in results if result["success"]),
+            "results": results
+        }
+    
     def fetch_data(self, email):
-        user_ref = self.db.collection("user-data").document(email)
-        user_data = user_ref.get().to_dict()
+        user_data = self._get_user_doc(email)
         
         if not user_data:
             return None
         
-        result = {
-            "email": email,
-            "name": user_data.get("name", "")
-        }
+        return user_document(email, user_data)
+    
+    def fetch_versioned_data(self, email):
+        # (document, version); the version changes whenever Firestore does.
+        user_data, version = self._get_user_entry(email)
         
-        for key, value in user_data.items():
-            if key.startswith("semester_"):
-                result[key] = value
+        if not user_data:
+            return None, None
         
-        return result
+        return user_document(email, user_data), version
+    
+    def get_user_snapshot(self, email):
+        snapshot = self.db.collection("user-data").document(email).get()
+        self._cache_doc(email, snapshot.to_dict(), snapshot.update_time)
+        return snapshot
     
-    def save_data_to_file(self, email):
-        data = self.fetch_data(email)
-        if data:
-            with open('student_data.json', 'w') as f:
-                json.dump(data, f, indent=2)
-            return {"success": True, "message": "Data saved to student_data.json"}
-        return {"success": False, "message": f"No data found for {email}"}
+    def watch_user(self, email, callback):
+        def on_snapshot(snapshots, changes, read_time):
+            for snapshot in snapshots:
+                self._cache_doc(email, snapshot.to_dict(), snapshot.update_time)
+            callback(snapshots, changes, read_time)
+        
+        return self.db.collection("user-data").document(email).on_snapshot(on_snapshot)
 
 class StudentDataManager:
-    def __init__(self):
-        self.firebase_client = FirebaseClient()
+    def __init__(self, firebase_client=None):
+        self.firebase_client = firebase_client or FirebaseClient()
+        self.data_store = StudentDataStore(os.getenv("STUDENT_DATA_FILE", "student_data.json"))
+        self.user_store = UserDataStore(os.getenv("STUDENT_DB_FILE", "student_data.db"))
+        self.grade_engine = GradeEngine()
+        self.event_index = EventIndex()
+        self.prompt_builder = PromptBuilder(context_tokens=int(os.getenv("PROMPT_CONTEXT_TOKENS", 1200)))
+        self.sync = SyncManager(
+            self.firebase_client,
+            self.user_store,
+            debounce=float(os.getenv("SYNC_DEBOUNCE_SECONDS", 1.0)),
+            max_watches=int(os.getenv("SYNC_MAX_LISTENERS", 100))
+        )
     
     def create_user(self, email, name):
         return self.firebase_client.save_user(email, name)
     
     def create_semester(self, email, semester_num, term_name):
-        return self.firebase_client.add_semester(email, semester_num, term_name)
+        result = self.firebase_client.add_semester(email, semester_num, term_name)
+        previous_version = self.user_store.version(email)
+        if result.get("success") and previous_version is not None:
+            semester_key = f"semester_{semester_num}"
+            version = self.user_store.upsert_semester(email, semester_key, term_name)
+            self.event_index.update_courses(
+                email, semester_key, [], previous_version, version, replace_semester=True
+            )
+        return result
     
     def add_courses_to_semester(self, email, semester_num, courses):
-        return self.firebase_client.add_courses(email, semester_num, courses)
+        result = self.firebase_client.add_courses(email, semester_num, courses)
+        previous_version = self.user_store.version(email)
+        if result.get("success") and previous_version is not None:
+            semester_key = f"semester_{semester_num}"
+            version = self.user_store.set_semester_courses(email, semester_key, courses)
+            self.event_index.update_courses(
+                email, semester_key, courses, previous_version, version, replace_semester=True
+            )
+        return result
     
     def get_user_data(self, email):
         return self.firebase_client.fetch_data(email)
     
+    def get_versioned_user_data(self, email):
+        return self.firebase_client.fetch_versioned_data(email)
+    
+    def bulk_write_users(self, users):
+        return self.firebase_client.bulk_write(users)
+    
     def sync_data_to_file(self, email):
-        return self.firebase_client.save_data_to_file(email)
+        result = self.sync.sync(email)
+        if result["status"] == "missing":
+            return {"success": False, "message": f"No data found for {email}"}
+        
+        # Clients that do not send an email (the dashboard, chat-panel
+        # syllabus saves) use the shared file, so the synced document is
+        # written there too.
+        document = self.user_store.get_user(email)
+        try:
+            current = self.data_store.load()
+        except (FileNotFoundError, json.JSONDecodeError):
+            current = None
+        if current != document:
+            self.data_store.replace(document)
+        return {"success": True, "message": f"Data for {email} saved to local store and {self.data_store.path}", **result}
     
-    def get_student_data_from_file(self):
+    def get_local_user_data(self, email):
+        return self.user_store.get_user(email)
+    
+    def get_event_index(self, email=None):
+        if email:
+            version = self.user_store.version(email)
+            if version is None:
+                return None
+            return self.event_index.get(email, version, lambda: self.user_store.get_user(email))
+        return self.event_index.get(None, self.data_store.version, self.data_store.load)
+    
+    def compute_grades(self, email=None, target=None, what_if=None):
+        if email:
+            version = self.user_store.version(email)
+            if version is None:
+                return None
+            load_document = lambda: self.user_store.get_user(email)
+        else:
+            version = self.data_store.version
+            load_document = self.data_store.load
+        return self.grade_engine.compute(load_document, key=(email, version), target=target, what_if=what_if)
+    
+    def build_chat_prompt(self, task_type, prompt, email=None, summary=None, request_id=None):
+        sections = sections_for_task(task_type)
+        document = events = grades = None
+        try:
+            if "courses" in sections:
+                document = self.user_store.get_user(email) if email else self.data_store.load()
+            if any(section.startswith("upcoming_") for section in sections):
+                events = self.get_event_index(email)
+            if "grades" in sections:
+                grades = self.compute_grades(email)
+        except Exception as e:
+            report_error("Error loading chat context", e, route="/api/chat", request_id=request_id)
+        
+        today = datetime.date.today().isoformat()
+        return self.prompt_builder.build(
+            task_type, prompt, today, document=document, events=events, grades=grades, summary=summary
+        )
+    
+    def get_stats(self):
+        return {"firestore_cache": self.firebase_client.cache_stats(), "sync": self.sync.stats()}
+    
+    def _read_student_data(self, reader):
         try:
-            with open('student_data.json', 'r') as file:
-                data = json.load(file)
-            return data
+            return reader()
         except FileNotFoundError:
             return {"error": "Student data file not found"}
         except json.JSONDecodeError:
@@ -108,62 +374,127 @@ class StudentDataManager:
         except Exception as e:
             return {"error": f"Error reading student data: {str(e)}"}
     
-    def save_syllabus_data(self, syllabus_data):
+    def get_student_data_from_file(self):
+        return self._read_student_data(self.data_store.load)
+    
+    def get_student_data_bytes(self):
+        data = self._read_student_data(self.data_store.read_bytes)
+        if isinstance(data, dict):
+            return json.dumps(data).encode()
+        return data
+    
+    @staticmethod
+    def course_info(syllabus_data):
+        return {
+            "course_name": syllabus_data.get('course_name', 'Unknown Course'),
+            "instructor_name": syllabus_data.get('instructor_name', 'Unknown Instructor'),
+            "start_time": syllabus_data.get('start_time', ''),
+            "end_time": syllabus_data.get('end_time', ''),
+            "grade": "",
+            "current_marks": {},
+            "marks_distribution": syllabus_data.get('marks_distribution', {}),
+            "schedule": syllabus_data.get('schedule', [])
+        }
+    
+    def save_syllabus_data(self, syllabus_data, email=None, semester_num=None):
+        return self.save_syllabus_courses([syllabus_data], email=email, semester_num=semester_num)
+    
+    def save_syllabus_courses(self, syllabus_list, email=None, semester_num=None):
+        # One write for any number of courses, upserted by course name; the
+        # last of several courses sharing a name wins.
+        by_name = {}
+        for syllabus_data in syllabus_list:
+            course = self.course_info(syllabus_data)
+            by_name[course["course_name"]] = course
+        courses = list(by_name.values())
+        semester_key = f"semester_{semester_num}" if semester_num else None
+        
+        if email:
+            previous_version = self.user_store.version(email)
+            saved = self.user_store.upsert_courses(email, courses, semester_key)
+            if saved is None:
+                return {"error": f"No semester found for {email}"}
+            semester_key, version = saved
+            self.event_index.update_courses(email, semester_key, courses, previous_version, version)
+            return {"success": True, "message": "Course information saved successfully", "semester": semester_key}
+        
+        def upsert_courses(student_data):
+            if semester_key is not None:
+                if semester_key not in student_data:
+                    return {"error": f"Semester {semester_num} not found in student data"}
+                target = semester_key
+            else:
+                semesters = [k for k in student_data.keys() if k.startswith('semester_')]
+                if not semesters:
+                    return {"error": "No semesters found in student data"}
+                target = semesters[0]
+            
+            existing = student_data[target].setdefault('courses', [])
+            positions = {}
+            for i, course in enumerate(existing):
+                positions.setdefault(course['course_name'], i)
+            for course in courses:
+                if course['course_name'] in positions:
+                    existing[positions[course['course_name']]] = course
+                else:
+                    positions[course['course_name']] = len(existing)
+                    existing.append(course)
+            
+            return {"success": True, "message": "Course information saved successfully", "semester": target}
+        
         try:
-            try:
-                with open('student_data.json', 'r') as file:
-                    student_data = json.load(file)
-            except (FileNotFoundError, json.JSONDecodeError):
-                return {"error": "Could not read student data file"}
-            
-            semesters = [k for k in student_data.keys() if k.startswith('semester_')]
-            if not semesters:
-                return {"error": "No semesters found in student data"}
-            
-            semester_key = semesters[0]
-            
-            course_info = {
-                "course_name": syllabus_data.get('course_name', 'Unknown Course'),
-                "instructor_name": syllabus_data.get('instructor_name', 'Unknown Instructor'),
-                "start_time": syllabus_data.get('start_time', ''),
-                "end_time": syllabus_data.get('end_time', ''),
-                "grade": "",
-                "current_marks": {},
-                "marks_distribution": syllabus_data.get('marks_distribution', {}),
-                "schedule": syllabus_data.get('schedule', [])
-            }
-            
-            course_exists = False
-            for i, course in enumerate(student_data[semester_key]['courses']):
-                if course['course_name'] == course_info['course_name']:
-                    student_data[semester_key]['courses'][i] = course_info
-                    course_exists = True
-                    break
-            
-            if not course_exists:
-                student_data[semester_key]['courses'].append(course_info)
-            
-            with open('student_data.json', 'w') as file:
-                json.dump(student_data, file, indent=2)
-            
-            return {"success": True, "message": "Course information saved successfully"}
+            return self.data_store.update(upsert_courses)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"error": "Could not read student data file"}
         except Exception as e:
-            import traceback
-            print(f"Error saving syllabus data: {str(e)}")
-            print(traceback.format_exc())
+            report_error("Error saving syllabus data", e)
             return {"error": str(e)}
 
+# Like FirebaseClient, vertexai is imported and the model built on first use;
+# importing vertexai alone takes about two seconds.
+@instrumented("gemini")
 class GeminiClient:
-    def __init__(self):
-        os.environ["GOOGLE_CLOUD_PROJECT"] = os.getenv("GOOGLE_CLOUD_PROJECT")
-        os.environ["GOOGLE_CLOUD_LOCATION"] = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
-        
-        vertexai.init()
-        self.model = GenerativeModel("gemini-2.0-flash")
+    def __init__(self, model=None, scheduler=None):
+        self._model = model
+        self._model_lock = threading.Lock()
+        self.scheduler = scheduler or RequestScheduler(
+            max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", 8)),
+            rate=float(os.getenv("GEMINI_QPS", 0)) or None,
+            max_retries=int(os.getenv("GEMINI_MAX_RETRIES", 3))
+        )
     
-    def prepare_contents(self, prompt, file_uri=None):
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    import vertexai
+                    from vertexai.generative_models import GenerativeModel
+                    
+                    os.environ["GOOGLE_CLOUD_PROJECT"] = os.getenv("GOOGLE_CLOUD_PROJECT")
+                    os.environ["GOOGLE_CLOUD_LOCATION"] = os.getenv("GOOGLE_CLOUD_LOCATION", "us-central1")
+                    
+                    vertexai.init()
+                    self._model = GenerativeModel("gemini-2.0-flash")
+        return self._model
+    
+    def prepare_contents(self, prompt, file_uri=None, file_data=None, mime_type=None, history=None):
+        if history:
+            from vertexai.generative_models import Part, Content
+            
+            contents = [Content(role=role, parts=[Part.from_text(text)]) for role, text in history]
+            current = self.prepare_contents(prompt, file_uri, file_data, mime_type)
+            parts = [part if isinstance(part, Part) else Part.from_text(part) for part in current]
+            contents.append(Content(role="user", parts=parts))
+            return contents
+        
         contents = []
-        if file_uri:
+        if file_data is not None or file_uri:
+            from vertexai.generative_models import Part
+        
+        if file_data is not None:
+            contents.append(Part.from_data(file_data, mime_type=mime_type))
+        elif file_uri:
             if file_uri.lower().endswith(('.png', '.jpg', '.jpeg')):
                 if file_uri.startswith(('http://', 'https://', 'gs://')):
                     contents.append(Part.from_uri(file_uri, mime_type='image/jpeg'))
@@ -182,134 +513,330 @@ class GeminiClient:
         contents.append(prompt)
         return contents
     
-    def generate_content(self, prompt, file_uri=None):
-        contents = self.prepare_contents(prompt, file_uri)
+    def _record_usage(self, method, response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            LLM_TOKENS.inc(method, "prompt", amount=usage.prompt_token_count)
+            LLM_TOKENS.inc(method, "completion", amount=usage.candidates_token_count)
+    
+    def _generate(self, method, contents):
         response = self.model.generate_content(contents)
+        self._record_usage(method, response)
+        return response
+    
+    def _stream_usage(self, method, chunks):
+        # Streams report usage on their last chunk.
+        last = None
+        try:
+            for chunk in chunks:
+                last = chunk
+                yield chunk
+        finally:
+            chunks.close()
+            self._record_usage(method, last)
+    
+    async def _async_stream_usage(self, method, chunks):
+        last = None
+        try:
+            async for chunk in chunks:
+                last = chunk
+                yield chunk
+        finally:
+            await chunks.aclose()
+            self._record_usage(method, last)
+    
+    def generate_content(self, prompt, file_uri=None, history=None):
+        contents = self.prepare_contents(prompt, file_uri, history=history)
+        key = None if history else ("generate", prompt, file_uri)
+        response = self.scheduler.call(self._generate, "generate_content", contents, key=key)
         return response.text
     
-    def stream_generate_content(self, prompt, file_uri=None):
-        contents = self.prepare_contents(prompt, file_uri)
-        return self.model.generate_content(contents, stream=True)
-    
-    def generate_syllabus_analysis(self, pdf_uri):
-        prompt = """For context: Class hours is the start_time and end_time of classes. Analyze the syllabus PDF and return structured data in this exact JSON format:
-                {
-                  "course_name": string,
-                  "instructor_name": string,
-                  "start_time": "HH:MM XM",
-                  "end_time": "HH:MM XM",
-                  "schedule": [{
-                    "date": "YYYY-MM-DD",
-                    "type": "class|assignment|quiz|exam|project|other",
-                    "title": string,
-                    "description": string
-                  }],
-                  "marks_distribution": {
-                    "assignment": percentage,
-                    "quiz": percentage,
-                    "exam": percentage,
-                    "project": percentage
-                  }
-                }
-                Your response must be valid JSON only, with no additional text, markdown formatting, or code blocks."""
-        
-        contents = self.prepare_contents(prompt, file_uri=pdf_uri)
-        response = self.model.generate_content(contents)
-        
-        response_text = response.text.strip()
-        
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-            
-        response_text = response_text.strip()
-        
-        return json.loads(response_text)
+    def stream_generate_content(self, prompt, file_uri=None, history=None):
+        contents = self.prepare_contents(prompt, file_uri, history=history)
+        chunks = self.scheduler.stream(self.model.generate_content, contents, stream=True)
+        return self._stream_usage("stream_generate_content", chunks)
+    
+    def async_stream_generate_content(self, prompt, file_uri=None, history=None):
+        contents = self.prepare_contents(prompt, file_uri, history=history)
+        chunks = self.scheduler.astream(self.model.generate_content_async, contents, stream=True)
+        return self._async_stream_usage("async_stream_generate_content", chunks)
+    
+    def stream_syllabus_analysis(self, pdf_uri=None, pdf_data=None):
+        contents = self.prepare_contents(
+            SYLLABUS_ANALYSIS_PROMPT, file_uri=pdf_uri, file_data=pdf_data, mime_type='application/pdf'
+        )
+        chunks = self.scheduler.stream(self.model.generate_content, contents, stream=True)
+        return extract_syllabus(self._stream_usage("stream_syllabus_analysis", chunks))
+    
+    def generate_syllabus_analysis(self, pdf_uri=None, pdf_data=None):
+        analysis = None
+        for event, data in self.stream_syllabus_analysis(pdf_uri, pdf_data):
+            if event == "analysis":
+                analysis = data
+        return analysis
 
 class StudentAssistantAPI:
-    def __init__(self):
+    def __init__(self, gemini_client=None, student_data_manager=None):
         self.app = Flask(__name__)
-        CORS(self.app)
-        self.gemini_client = GeminiClient()
-        self.student_data_manager = StudentDataManager()
+        self.app.request_class = BufferedUploadRequest
+        self.app.config['MAX_UPLOAD_BYTES'] = int(os.getenv("MAX_UPLOAD_BYTES", DEFAULT_MAX_UPLOAD_BYTES))
+        CORS(self.app, **CORS_OPTIONS)
+        instrument_app(self.app)
+        self.gemini_client = gemini_client or GeminiClient()
+        self.student_data_manager = student_data_manager or StudentDataManager()
+        self.analysis_cache = AnalysisCache(
+            os.getenv("ANALYSIS_CACHE_FILE", "analysis_cache.db"),
+            max_bytes=int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+        )
+        response_cache_bytes = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+        self.response_cache = LRUCache(
+            maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", 4096)),
+            ttl=float(os.getenv("RESPONSE_CACHE_TTL", 3600)),
+            max_bytes=response_cache_bytes,
+            sizeof=lambda text: len(text.encode())
+        ) if response_cache_bytes > 0 else None
+        session_db = os.getenv("SESSION_DB_FILE")
+        self.sessions = SessionStore(
+            summarize=self.summarize_conversation,
+            max_sessions=int(os.getenv("SESSION_MAX_COUNT", 10000)),
+            idle_ttl=float(os.getenv("SESSION_IDLE_TTL", 3600)),
+            compact_tokens=int(os.getenv("SESSION_COMPACT_TOKENS", 2000)),
+            keep_turns=int(os.getenv("SESSION_KEEP_TURNS", 4)),
+            backing=SessionBacking(session_db) if session_db else None
+        )
+        self.representations = RepresentationCache(
+            max_bytes=int(os.getenv("REPRESENTATION_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+        )
+        self.sse_heartbeat_interval = float(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+        self.syllabus_jobs = JobQueue(
+            self.analyze_syllabus_pdf,
+            max_workers=int(os.getenv("SYLLABUS_WORKERS", 4)),
+            max_pending=int(os.getenv("SYLLABUS_QUEUE_LIMIT", 32)),
+            max_finished=int(os.getenv("SYLLABUS_JOBS_KEPT", 10000))
+        )
+        self.import_max_files = int(os.getenv("SYLLABUS_IMPORT_MAX_FILES", 20))
+        self.syllabus_import_pool = ThreadPoolExecutor(
+            max_workers=int(os.getenv("SYLLABUS_IMPORT_WORKERS", 4)), thread_name_prefix="import"
+        )
         self.setup_routes()
     
     def setup_routes(self):
         self.app.route('/api/chat', methods=['POST'])(self.chat)
+        self.app.route('/api/syllabus_jobs/<job_id>', methods=['GET'])(self.get_syllabus_job)
         self.app.route('/api/tasks', methods=['GET'])(self.get_tasks)
         self.app.route('/api/health', methods=['GET'])(self.health_check)
+        self.app.route('/api/stats', methods=['GET'])(self.get_stats)
+        self.app.route('/metrics', methods=['GET'])(self.metrics)
         self.app.route('/api/fetch_data', methods=['GET'])(self.fetch_data)
         self.app.route('/api/get_student_data', methods=['GET'])(self.get_student_data)
         self.app.route('/api/save_user', methods=['POST'])(self.save_user)
         self.app.route('/api/add_semester', methods=['POST'])(self.add_semester)
         self.app.route('/api/add_courses', methods=['POST'])(self.add_courses)
+        self.app.route('/api/bulk_write', methods=['POST'])(self.bulk_write)
         self.app.route('/api/sync_data', methods=['POST'])(self.sync_data)
         self.app.route('/api/save_syllabus_data', methods=['POST'])(self.save_syllabus_data)
+        self.app.route('/api/import_syllabi', methods=['POST'])(self.import_syllabi)
+        self.app.route('/api/events', methods=['GET'])(self.get_events)
+        self.app.route('/api/events/upcoming', methods=['GET'])(self.get_upcoming_events)
+        self.app.route('/api/events/clashes', methods=['GET'])(self.get_event_clashes)
+        self.app.route('/api/events.ics', methods=['GET'])(self.export_events_ics)
+        self.app.route('/api/grades', methods=['GET', 'POST'])(self.get_grades)
     
     def chat(self):
         try:
             data = request.form.to_dict() if request.files else request.json
             user_prompt = data.get('prompt', '')
-            task_type = data.get('task_type', 'general')
             image_url = data.get('image_url', None)
             no_stream = data.get('no_stream', False)
             action = data.get('action', 'chat')
+            sse = data.get('stream_mode') == 'sse' or request.accept_mimetypes.best == 'text/event-stream'
             
             if action == 'analyze_syllabus' and request.files and 'file' in request.files:
-                return self.handle_syllabus_analysis(request.files['file'])
+                return self.handle_syllabus_analysis(request.files['file'], sse=sse)
             
             if not user_prompt:
                 return jsonify({"error": "No prompt provided"}), 400
             
+            prompt, cache_key, history, remember = self.plan_chat(data)
+            
             if no_stream:
-                return self.handle_non_streaming_response(user_prompt, image_url)
+                return self.handle_non_streaming_response(prompt, image_url, cache_key, history, remember)
             else:
-                return self.handle_streaming_response(user_prompt, image_url)
+                return self.handle_streaming_response(prompt, image_url, cache_key, history, remember, sse=sse)
         
+        except RequestEntityTooLarge as e:
+            return jsonify({"error": e.description}), 413
         except Exception as e:
-            import traceback
-            print(f"Error in chat endpoint: {str(e)}")
-            print(traceback.format_exc())
+            report_error("Error in chat endpoint", e)
             return jsonify({"error": str(e)}), 500
     
-    def handle_syllabus_analysis(self, file):
+    def plan_chat(self, data, request_id=None):
+        # Everything a chat turn needs before the model is called: the full
+        # prompt, the response cache key, session history and a callback that
+        # records the answer. Shared with the ASGI server in asgi.py.
+        user_prompt = data.get('prompt', '')
+        task_type = data.get('task_type', 'general')
+        image_url = data.get('image_url', None)
+        use_cache = data.get('cache', True) not in (False, 'false', '0')
+        
+        session_id = data.get('session_id')
+        summary, history = self.sessions.get(session_id).history() if session_id else (None, [])
+        
+        prompt, context_hash = self.student_data_manager.build_chat_prompt(
+            task_type, user_prompt, email=data.get('email'), summary=summary, request_id=request_id
+        )
+        
+        cache_key = None
+        if self.response_cache is not None and use_cache and not summary and not history:
+            cache_key = response_cache_key(user_prompt, task_type, image_url, context_hash)
+        
+        def remember(answer):
+            if session_id:
+                self.sessions.append(session_id, user_prompt, answer)
+        
+        return prompt, cache_key, history, remember
+    
+    def handle_syllabus_analysis(self, file, sse=False):
         if file.filename == '':
             return jsonify({"error": "No file selected"}), 400
             
         if not file.filename.lower().endswith('.pdf'):
             return jsonify({"error": "File must be a PDF"}), 400
         
-        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp:
-            file.save(temp.name)
-            temp_path = temp.name
+        try:
+            pdf_data, digest = read_pdf_upload(file)
+        except InvalidUpload as e:
+            return jsonify({"error": str(e)}), 400
+        
+        analysis = self.analysis_cache.get(digest, SYLLABUS_PROMPT_VERSION)
+        if sse:
+            return self.stream_syllabus_analysis(pdf_data, digest, analysis)
+        if analysis is not None:
+            response = jsonify(self.syllabus_jobs.completed(digest, analysis).to_dict())
+            response.headers['X-Analysis-Cache'] = 'HIT'
+            return response
         
         try:
-            analysis = self.gemini_client.generate_syllabus_analysis(temp_path)
-            os.unlink(temp_path)
-            return jsonify(analysis)
-        except Exception as e:
-            os.unlink(temp_path)
-            raise e
+            job = self.syllabus_jobs.submit(digest, pdf_data, digest)
+        except JobQueueFull:
+            response = jsonify({"error": "Too many syllabus analyses in progress, try again shortly"})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        
+        response = jsonify(job.to_dict())
+        response.headers['X-Analysis-Cache'] = 'MISS'
+        return response, 202
+    
+    def stream_syllabus_analysis(self, pdf_data, digest, cached=None):
+        if cached is not None:
+            items = replay_syllabus(cached)
+        else:
+            items = self.syllabus_items(pdf_data, digest)
+        
+        events = sse_stream(
+            items,
+            heartbeat_interval=self.sse_heartbeat_interval,
+            complete_fields={"cached": True} if cached is not None else None,
+            as_event=lambda item: item
+        )
+        response = Response(stream_with_context(events), mimetype='text/event-stream', headers=SSE_HEADERS)
+        response.headers['X-Analysis-Cache'] = 'HIT' if cached is not None else 'MISS'
+        return response
+    
+    def syllabus_items(self, pdf_data, digest):
+        items = self.gemini_client.stream_syllabus_analysis(pdf_data=pdf_data)
+        try:
+            for event, data in items:
+                if event == "analysis" and not data.get("partial"):
+                    self.analysis_cache.put(digest, SYLLABUS_PROMPT_VERSION, data)
+                yield event, data
+        finally:
+            items.close()
+    
+    def analyze_syllabus_pdf(self, pdf_data, digest):
+        analysis = self.gemini_client.generate_syllabus_analysis(pdf_data=pdf_data)
+        if not analysis.get("partial"):
+            self.analysis_cache.put(digest, SYLLABUS_PROMPT_VERSION, analysis)
+        return analysis
     
-    def handle_non_streaming_response(self, prompt, image_url):
-        response_text = self.gemini_client.generate_content(prompt, file_uri=image_url)
+    def summarize_conversation(self, summary, turns):
+        transcript = "\n".join(
+            f"{'Student' if role == 'user' else 'Assistant'}: {text}" for role, text in turns
+        )
+        prompt = CONVERSATION_SUMMARY_PROMPT.format(summary=summary or "(none)", transcript=transcript)
+        return self.gemini_client.generate_content(prompt)
+    
+    def get_syllabus_job(self, job_id):
+        job = self.syllabus_jobs.get(job_id)
+        if job is None:
+            return jsonify({"error": f"No job found with id {job_id}"}), 404
+        return jsonify(job.to_dict())
+    
+    def cached_response(self, cache_key):
+        if cache_key is None:
+            return None
+        response_text = self.response_cache.get(cache_key, None)
+        RESPONSE_CACHE_LOOKUPS.inc("miss" if response_text is None else "hit")
+        return response_text
+    
+    def handle_non_streaming_response(self, prompt, image_url, cache_key=None, history=None, on_complete=None):
+        response_text = self.cached_response(cache_key)
+        cached = response_text is not None
+        if not cached:
+            response_text = self.gemini_client.generate_content(prompt, file_uri=image_url, history=history)
+            if cache_key is not None:
+                self.response_cache.set(cache_key, response_text)
+        if on_complete:
+            on_complete(response_text)
+        
         return jsonify({
             "response": response_text,
-            "status": "success"
+            "status": "success",
+            "cached": cached
         })
     
-    def handle_streaming_response(self, prompt, image_url):
+    def handle_streaming_response(self, prompt, image_url, cache_key=None, history=None, on_complete=None, sse=False):
+        cached_text = self.cached_response(cache_key)
+        cached = cached_text is not None
+        
+        def text_chunks():
+            if cached:
+                for i in range(0, len(cached_text), REPLAY_CHUNK_SIZE):
+                    yield cached_text[i:i + REPLAY_CHUNK_SIZE]
+                answer = cached_text
+            else:
+                response = self.gemini_client.stream_generate_content(prompt, file_uri=image_url, history=history)
+                parts = []
+                try:
+                    for chunk in response:
+                        if chunk.text:
+                            parts.append(chunk.text)
+                            yield chunk.text
+                finally:
+                    response.close()
+                
+                answer = "".join(parts)
+                if cache_key is not None:
+                    self.response_cache.set(cache_key, answer)
+            if on_complete:
+                on_complete(answer)
+        
+        if sse:
+            events = sse_stream(
+                text_chunks(),
+                heartbeat_interval=self.sse_heartbeat_interval,
+                complete_fields={"cached": True} if cached else None
+            )
+            return Response(stream_with_context(events), mimetype='text/event-stream', headers=SSE_HEADERS)
+        
         def generate():
-            response = self.gemini_client.stream_generate_content(prompt, file_uri=image_url)
-            
-            for chunk in response:
-                if chunk.text:
-                    yield json.dumps({"chunk": chunk.text}) + "\n"
+            for text in text_chunks():
+                yield json.dumps({"chunk": text}) + "\n"
             
-            yield json.dumps({"status": "complete"}) + "\n"
+            complete = {"status": "complete"}
+            if cached:
+                complete["cached"] = True
+            yield json.dumps(complete) + "\n"
         
         return Response(stream_with_context(generate()), mimetype='application/json')
     
@@ -326,30 +853,57 @@ class StudentAssistantAPI:
     def health_check(self):
         return jsonify({"status": "healthy"})
     
+    def get_stats(self):
+        stats = self.student_data_manager.get_stats()
+        stats["analysis_cache"] = self.analysis_cache.stats()
+        stats["syllabus_jobs"] = self.syllabus_jobs.stats()
+        stats["gemini_scheduler"] = self.gemini_client.scheduler.stats()
+        if self.response_cache is not None:
+            stats["response_cache"] = self.response_cache.stats()
+        stats["sessions"] = self.sessions.stats()
+        stats["representations"] = self.representations.stats()
+        return jsonify(stats)
+    
+    def metrics(self):
+        return Response(REGISTRY.render(), mimetype=METRICS_CONTENT_TYPE)
+    
+    def _student_file_response(self):
+        manager = self.student_data_manager
+        try:
+            version = manager.data_store.version
+        except (FileNotFoundError, json.JSONDecodeError):
+            return Response(manager.get_student_data_bytes(), mimetype='application/json')
+        return self.representations.response(request, "file", version, manager.get_student_data_from_file)
+    
     def fetch_data(self):
         try:
             email = request.args.get('email')
             if email:
-                data = self.student_data_manager.get_user_data(email)
-                if data:
-                    return jsonify(data)
-                return jsonify({"error": f"No data found for {email}"}), 404
+                data, version = self.student_data_manager.get_versioned_user_data(email)
+                if not data:
+                    return jsonify({"error": f"No data found for {email}"}), 404
+                return self.representations.response(request, ("firestore", email), version, lambda: data)
             
-            return jsonify(self.student_data_manager.get_student_data_from_file())
+            return self._student_file_response()
         except Exception as e:
-            import traceback
-            print(f"Error fetching data: {str(e)}")
-            print(traceback.format_exc())
+            report_error("Error fetching data", e)
             return jsonify({"error": str(e)}), 500
     
     def get_student_data(self):
         try:
-            data = self.student_data_manager.get_student_data_from_file()
-            return jsonify(data)
+            email = request.args.get('email')
+            if email:
+                manager = self.student_data_manager
+                version = manager.user_store.version(email)
+                if version is None:
+                    return jsonify({"error": f"No data found for {email}"}), 404
+                return self.representations.response(
+                    request, ("local", email), version, lambda: manager.get_local_user_data(email)
+                )
+            
+            return self._student_file_response()
         except Exception as e:
-            import traceback
-            print(f"Error getting student data: {str(e)}")
-            print(traceback.format_exc())
+            report_error("Error getting student data", e)
             return jsonify({"error": str(e)}), 500
     
     def save_user(self):
@@ -364,9 +918,7 @@ class StudentAssistantAPI:
             result = self.student_data_manager.create_user(email, name)
             return jsonify(result)
         except Exception as e:
-            import traceback
-            print(f"Error saving user: {str(e)}")
-            print(traceback.format_exc())
+            report_error("Error saving user", e)
             return jsonify({"error": str(e)}), 500
     
     def add_semester(self):
@@ -382,9 +934,7 @@ class StudentAssistantAPI:
             result = self.student_data_manager.create_semester(email, semester_num, term_name)
             return jsonify(result)
         except Exception as e:
-            import traceback
-            print(f"Error adding semester: {str(e)}")
-            print(traceback.format_exc())
+            report_error("Error adding semester", e)
             return jsonify({"error": str(e)}), 500
     
     def add_courses(self):
@@ -400,9 +950,21 @@ class StudentAssistantAPI:
             result = self.student_data_manager.add_courses_to_semester(email, semester_num, courses)
             return jsonify(result)
         except Exception as e:
-            import traceback
-            print(f"Error adding courses: {str(e)}")
-            print(traceback.format_exc())
+            report_error("Error adding courses", e)
+            return jsonify({"error": str(e)}), 500
+    
+    def bulk_write(self):
+        try:
+            data = request.json
+            users = data.get('users')
+            
+            if not users or not isinstance(users, list):
+                return jsonify({"error": "A list of users is required"}), 400
+            
+            result = self.student_data_manager.bulk_write_users(users)
+            return jsonify(result)
+        except Exception as e:
+            report_error("Error in bulk write", e)
             return jsonify({"error": str(e)}), 500
     
     def sync_data(self):
@@ -416,9 +978,7 @@ class StudentAssistantAPI:
             result = self.student_data_manager.sync_data_to_file(email)
             return jsonify(result)
         except Exception as e:
-            import traceback
-            print(f"Error syncing data: {str(e)}")
-            print(traceback.format_exc())
+            report_error("Error syncing data", e)
             return jsonify({"error": str(e)}), 500
     
     def save_syllabus_data(self):
@@ -429,13 +989,191 @@ class StudentAssistantAPI:
             if not syllabus_data:
                 return jsonify({"error": "No data provided"}), 400
             
-            result = self.student_data_manager.save_syllabus_data(syllabus_data)
+            result = self.student_data_manager.save_syllabus_data(
+                syllabus_data, email=data.get('email'), semester_num=data.get('semester_num')
+            )
             return jsonify(result)
             
         except Exception as e:
-            import traceback
-            print(f"Error saving syllabus data: {str(e)}")
-            print(traceback.format_exc())
+            report_error("Error saving syllabus data", e)
+            return jsonify({"error": str(e)}), 500
+    
+    def import_syllabi(self):
+        try:
+            files = request.files.getlist('files') or request.files.getlist('file')
+            if not files:
+                return jsonify({"error": "No files provided"}), 400
+            if len(files) > self.import_max_files:
+                return jsonify({"error": f"At most {self.import_max_files} files can be imported at once"}), 400
+            
+            uploads = []
+            for file in files:
+                try:
+                    if not file.filename.lower().endswith('.pdf'):
+                        raise InvalidUpload("File must be a PDF")
+                    pdf_data, digest = read_pdf_upload(file)
+                    uploads.append((file.filename, pdf_data, digest, None))
+                except InvalidUpload as e:
+                    uploads.append((file.filename, None, None, str(e)))
+            
+            items = self.import_items(uploads, email=request.form.get('email'), semester_num=request.form.get('semester_num'))
+            if request.form.get('stream_mode') == 'sse' or request.accept_mimetypes.best == 'text/event-stream':
+                events = sse_stream(items, heartbeat_interval=self.sse_heartbeat_interval, as_event=lambda item: item)
+                return Response(stream_with_context(events), mimetype='text/event-stream', headers=SSE_HEADERS)
+            
+            def generate():
+                for event, data in items:
+                    yield json.dumps({"event": event, **data}) + "\n"
+                yield json.dumps({"status": "complete"}) + "\n"
+            
+            return Response(stream_with_context(generate()), mimetype='application/json')
+        
+        except RequestEntityTooLarge as e:
+            return jsonify({"error": e.description}), 413
+        except Exception as e:
+            report_error("Error importing syllabi", e)
+            return jsonify({"error": str(e)}), 500
+    
+    def import_items(self, uploads, email=None, semester_num=None):
+        # Analyzes the uploads on the shared import pool and yields a "file"
+        # progress item as each one starts and finishes, then saves every
+        # complete analysis, in upload order, with a single write.
+        progress = queue.Queue()
+        
+        def analyze(index, filename, pdf_data, digest):
+            progress.put(("file", {"index": index, "filename": filename, "status": "analyzing"}, None))
+            try:
+                analysis = self.analysis_cache.get(digest, SYLLABUS_PROMPT_VERSION)
+                cached = analysis is not None
+                if not cached:
+                    analysis = self.analyze_syllabus_pdf(pdf_data, digest)
+            except Exception as e:
+                report_error(f"Error analyzing {filename}", e, route="/api/import_syllabi")
+                progress.put(("file", {"index": index, "filename": filename, "status": "failed", "error": str(e)}, None))
+                return
+            progress.put(("file", {
+                "index": index,
+                "filename": filename,
+                "status": "partial" if analysis.get("partial") else "analyzed",
+                "cached": cached,
+                "course_name": analysis.get("course_name"),
+                "events": len(analysis.get("schedule", [])),
+                "warnings": analysis.get("warnings", [])
+            }, analysis))
+        
+        futures = []
+        analyses = {}
+        try:
+            for index, (filename, pdf_data, digest, error) in enumerate(uploads):
+                if error is not None:
+                    yield "file", {"index": index, "filename": filename, "status": "failed", "error": error}
+                else:
+                    futures.append(self.syllabus_import_pool.submit(analyze, index, filename, pdf_data, digest))
+            
+            finished = 0
+            while finished < len(futures):
+                event, data, analysis = progress.get()
+                if data["status"] != "analyzing":
+                    finished += 1
+                if data["status"] == "analyzed":
+                    analyses[data["index"]] = analysis
+                yield event, data
+        finally:
+            for future in futures:
+                future.cancel()
+        
+        summary = {"analyzed": len(analyses), "skipped": len(uploads) - len(analyses)}
+        if not analyses:
+            yield "saved", {"success": False, "message": "No syllabus could be imported", **summary}
+            return
+        result = self.student_data_manager.save_syllabus_courses(
+            [analyses[index] for index in sorted(analyses)], email=email, semester_num=semester_num
+        )
+        yield "saved", {**result, **summary, "courses": [analyses[index].get("course_name") for index in sorted(analyses)]}
+    
+    def _event_index_or_404(self):
+        email = request.args.get('email')
+        index = self.student_data_manager.get_event_index(email)
+        if index is None:
+            return None, (jsonify({"error": f"No data found for {email}"}), 404)
+        return index, None
+    
+    def get_events(self):
+        try:
+            index, error = self._event_index_or_404()
+            if error:
+                return error
+            
+            events = index.range(
+                start=request.args.get('from'),
+                end=request.args.get('to'),
+                event_type=request.args.get('type')
+            )
+            return jsonify(events)
+        except Exception as e:
+            report_error("Error getting events", e)
+            return jsonify({"error": str(e)}), 500
+    
+    def get_upcoming_events(self):
+        try:
+            index, error = self._event_index_or_404()
+            if error:
+                return error
+            
+            today = request.args.get('from') or datetime.date.today().isoformat()
+            limit = request.args.get('n', 5, type=int)
+            types = request.args.get('type')
+            events = index.upcoming(today, limit, types.split(',') if types else DEADLINE_TYPES)
+            return jsonify(events)
+        except Exception as e:
+            report_error("Error getting upcoming events", e)
+            return jsonify({"error": str(e)}), 500
+    
+    def get_event_clashes(self):
+        try:
+            index, error = self._event_index_or_404()
+            if error:
+                return error
+            return jsonify(index.clashes())
+        except Exception as e:
+            report_error("Error getting event clashes", e)
+            return jsonify({"error": str(e)}), 500
+    
+    def export_events_ics(self):
+        try:
+            index, error = self._event_index_or_404()
+            if error:
+                return error
+            
+            email = request.args.get('email') or ''
+            response = Response(iter_ics(index, uid_seed=email), mimetype='text/calendar')
+            response.headers['Content-Disposition'] = 'attachment; filename=studysync.ics'
+            return response
+        except Exception as e:
+            report_error("Error exporting events", e)
+            return jsonify({"error": str(e)}), 500
+    
+    def get_grades(self):
+        try:
+            data = request.json if request.method == 'POST' else request.args
+            email = data.get('email')
+            target = data.get('target')
+            what_if = data.get('what_if') if request.method == 'POST' else None
+            
+            if target is not None:
+                try:
+                    target = float(target)
+                except (TypeError, ValueError):
+                    return jsonify({"error": "target must be a number"}), 400
+            if what_if is not None and not isinstance(what_if, dict):
+                return jsonify({"error": "what_if must map course names to marks"}), 400
+            
+            result = self.student_data_manager.compute_grades(email, target=target, what_if=what_if)
+            if result is None:
+                return jsonify({"error": f"No data found for {email}"}), 404
+            return jsonify(result)
+        except Exception as e:
+            report_error("Error computing grades", e)
             return jsonify({"error": str(e)}), 500
     
     def run(self, debug=True, host="0.0.0.0", port=None):
@@ -488,8 +1226,13 @@ def run_examples():
     #     except Exception as e:
     #         print(f"Error analyzing syllabus: {str(e)}")
 
+def create_app():
+    # WSGI entry point: gunicorn "app:create_app()"
+    return StudentAssistantAPI().app
+
 if __name__ == "__main__":
-    run_examples()
+    if "--examples" in sys.argv:
+        run_examples()
     
     api = StudentAssistantAPI()
     api.run()
\ No newline at end of file
@@ -0,0 +1,281 @@
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from flask_cors.core import get_cors_headers, get_cors_options
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from app import StudentAssistantAPI, REPLAY_CHUNK_SIZE, CORS_OPTIONS
+from streaming import async_sse_stream, SSE_HEADERS
+from metrics import RequestTimer, report_error
+
+# Room for multipart boundaries and form fields around an upload of
+# MAX_UPLOAD_BYTES.
+MAX_BODY_SLACK = 64 * 1024
+
+
+def _environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        key = name if name in ("CONTENT_TYPE", "CONTENT_LENGTH") else f"HTTP_{name}"
+        value = value.decode("latin-1")
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+# Serves StudentAssistantAPI under an ASGI server such as uvicorn. Streaming
+# chat runs on the event loop against Gemini's async API, so an open stream
+# costs a coroutine instead of a worker thread. Every other request,
+# including non-streaming chat, goes to the Flask app on a bounded thread
+# pool, so the routes stay the ones registered in setup_routes().
+class AsyncStudentAssistantAPI:
+    def __init__(self, api=None, max_threads=None):
+        self.api = api or StudentAssistantAPI()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_threads or int(os.getenv("ASGI_THREADS", 32)),
+            thread_name_prefix="asgi-wsgi"
+        )
+        self.max_body = self.api.app.config['MAX_UPLOAD_BYTES'] + MAX_BODY_SLACK
+        # The options flask_cors applies to the Flask routes, so responses
+        # sent from here carry the same CORS headers.
+        self.cors_options = get_cors_options(self.api.app, CORS_OPTIONS)
+        self.open_streams = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        body = await self._read_body(scope, receive)
+        if body is None:
+            cors_headers = self._cors_headers(dict(scope.get("headers", [])), scope["method"])
+            await self._send_json(send, 413, {"error": "Request body too large"}, cors_headers)
+            return
+        if scope["path"] == "/api/chat" and scope["method"] == "POST":
+            if await self._stream_chat(scope, body, receive, send):
+                return
+        await self._call_wsgi(scope, body, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _read_body(self, scope, receive):
+        headers = dict(scope.get("headers", []))
+        if int(headers.get(b"content-length", 0) or 0) > self.max_body:
+            return None
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            body += message.get("body", b"")
+            if len(body) > self.max_body:
+                return None
+            if not message.get("more_body"):
+                break
+        return bytes(body)
+
+    def _cors_headers(self, headers, method):
+        request_headers = {}
+        if headers.get(b"origin"):
+            request_headers["Origin"] = headers[b"origin"].decode("latin-1")
+        return [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in get_cors_headers(self.cors_options, request_headers, method).items(multi=True)
+        ]
+
+    async def _send_json(self, send, status, data, headers=()):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")] + list(headers)
+        })
+        await send({"type": "http.response.body", "body": json.dumps(data).encode()})
+
+    async def _stream_chat(self, scope, body, receive, send):
+        # Returns False for requests the Flask handler should answer:
+        # uploads, non-streaming chat and invalid bodies.
+        headers = dict(scope.get("headers", []))
+        if not headers.get(b"content-type", b"").startswith(b"application/json"):
+            return False
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return False
+        if not isinstance(data, dict) or not data.get('prompt') or data.get('no_stream'):
+            return False
+
+        timer = RequestTimer("/api/chat", "POST", headers.get(b"x-request-id", b"").decode("latin-1") or None)
+        try:
+            await self._answer_chat(data, headers, timer, receive, send)
+        finally:
+            timer.finish()
+        return True
+
+    async def _answer_chat(self, data, headers, timer, receive, send):
+        common_headers = self._cors_headers(headers, "POST") + [
+            (b"x-request-id", timer.request_id.encode("latin-1"))
+        ]
+        loop = asyncio.get_running_loop()
+        try:
+            prompt, cache_key, history, remember = await loop.run_in_executor(
+                self.executor, self.api.plan_chat, data, timer.request_id
+            )
+        except Exception as e:
+            report_error("Error in chat endpoint", e, route=timer.route, request_id=timer.request_id)
+            await self._send_json(send, 500, {"error": str(e)}, common_headers)
+            return
+
+        accept = parse_accept_header(headers.get(b"accept", b"").decode("latin-1"), MIMEAccept)
+        sse = data.get('stream_mode') == 'sse' or accept.best == 'text/event-stream'
+        cached_text = self.api.cached_response(cache_key)
+        cached = cached_text is not None
+        chunks = self._text_chunks(cached_text, prompt, data.get('image_url'), cache_key, history, remember)
+
+        if sse:
+            events = async_sse_stream(
+                chunks,
+                heartbeat_interval=self.api.sse_heartbeat_interval,
+                complete_fields={"cached": True} if cached else None
+            )
+            response_headers = [(b"content-type", b"text/event-stream; charset=utf-8")] + [
+                (name.lower().encode(), value.encode()) for name, value in SSE_HEADERS.items()
+            ]
+        else:
+            events = self._ndjson(chunks, cached)
+            response_headers = [(b"content-type", b"application/json")]
+
+        timer.status = 200
+        await self._send_stream(receive, send, response_headers + common_headers, events, timer)
+
+    async def _text_chunks(self, cached_text, prompt, image_url, cache_key, history, on_complete):
+        if cached_text is not None:
+            for i in range(0, len(cached_text), REPLAY_CHUNK_SIZE):
+                yield cached_text[i:i + REPLAY_CHUNK_SIZE]
+            answer = cached_text
+        else:
+            response = self.api.gemini_client.async_stream_generate_content(
+                prompt, file_uri=image_url, history=history
+            )
+            parts = []
+            try:
+                async for chunk in response:
+                    if chunk.text:
+                        parts.append(chunk.text)
+                        yield chunk.text
+            finally:
+                await response.aclose()
+
+            answer = "".join(parts)
+            if cache_key is not None:
+                self.api.response_cache.set(cache_key, answer)
+        await asyncio.get_running_loop().run_in_executor(self.executor, on_complete, answer)
+
+    async def _ndjson(self, chunks, cached):
+        try:
+            async for text in chunks:
+                yield json.dumps({"chunk": text}) + "\n"
+        finally:
+            await chunks.aclose()
+
+        complete = {"status": "complete"}
+        if cached:
+            complete["cached"] = True
+        yield json.dumps(complete) + "\n"
+
+    async def _send_stream(self, receive, send, headers, events, timer):
+        # Races the response against the client going away; a disconnect
+        # cancels the writer, which closes the Gemini stream and frees its
+        # scheduler slot.
+        async def write():
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            async for text in events:
+                await send({"type": "http.response.body", "body": text.encode(), "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+
+        self.open_streams += 1
+        writer = asyncio.ensure_future(write())
+        disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            await asyncio.wait({writer, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.open_streams -= 1
+            writer.cancel()
+            disconnect.cancel()
+            results = await asyncio.gather(writer, disconnect, return_exceptions=True)
+            await events.aclose()
+            if isinstance(results[0], Exception):
+                report_error("Error streaming chat response", results[0], route=timer.route, request_id=timer.request_id)
+
+    async def _call_wsgi(self, scope, body, send):
+        loop = asyncio.get_running_loop()
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started["status"] = int(status.split(" ", 1)[0])
+            started["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+            return lambda data: None
+
+        result = await loop.run_in_executor(self.executor, self.api.app, _environ(scope, body), start_response)
+        chunks = iter(result)
+        try:
+            await send({"type": "http.response.start", "status": started["status"], "headers": started["headers"]})
+            chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+            while chunk is not None:
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                chunk = await loop.run_in_executor(self.executor, next, chunks, None)
+            await send({"type": "http.response.body", "body": b""})
+        finally:
+            close = getattr(result, "close", None)
+            if close is not None:
+                await loop.run_in_executor(self.executor, close)
+
+def create_app():
+    return AsyncStudentAssistantAPI()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(create_app(), host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
@@ -0,0 +1,170 @@
+"""Shared helpers for the benchmark scripts.
+
+Builds StudentAssistantAPI on the in-process fakes, generates synthetic
+student documents, summarizes latencies and writes results as JSON files
+that a later run can be compared against with --baseline.
+"""
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fakes import FakeFirestore, FakeGenerativeModel  # noqa: E402
+
+EVENT_TYPES = ("class", "class", "class", "assignment", "quiz", "exam", "project")
+CATEGORIES = ("assignment", "quiz", "exam", "project")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(q / 100.0 * (len(values) - 1))))]
+
+
+def latency_summary(seconds):
+    if not seconds:
+        return {"count": 0}
+    return {
+        "count": len(seconds),
+        "mean_ms": round(1000 * sum(seconds) / len(seconds), 3),
+        "p50_ms": round(1000 * percentile(seconds, 50), 3),
+        "p95_ms": round(1000 * percentile(seconds, 95), 3),
+        "p99_ms": round(1000 * percentile(seconds, 99), 3),
+        "max_ms": round(1000 * max(seconds), 3)
+    }
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def synthetic_course(index, events, rng=None, start=datetime.date(2025, 1, 13)):
+    rng = rng or random.Random(index)
+    hour = 8 + index % 9
+    weights = [rng.randint(5, 40) for _ in CATEGORIES]
+    schedule = []
+    for i in range(events):
+        day = start + datetime.timedelta(days=rng.randint(0, 120))
+        event_type = rng.choice(EVENT_TYPES)
+        schedule.append({
+            "date": day.isoformat(),
+            "title": f"{event_type.title()} {i + 1}",
+            "description": f"Synthetic {event_type} for course {index}, item {i + 1}",
+            "type": event_type
+        })
+    return {
+        "course_name": f"SYN {1000 + index} Synthetic Course {index}",
+        "instructor_name": f"Instructor {index}",
+        "start_time": f"{hour % 12 or 12:02d}:00 {'AM' if hour < 12 else 'PM'}",
+        "end_time": f"{hour % 12 or 12:02d}:50 {'AM' if hour < 12 else 'PM'}",
+        "grade": "",
+        "current_marks": {category: rng.randint(60, 100) for category in CATEGORIES[:2]},
+        "marks_distribution": {
+            category: round(100 * weight / sum(weights)) for category, weight in zip(CATEGORIES, weights)
+        },
+        "schedule": schedule
+    }
+
+
+def synthetic_document(email, semesters=2, courses=6, events_per_course=200, seed=0):
+    rng = random.Random(seed)
+    document = {"email": email, "name": "Synthetic Student"}
+    for semester in range(1, semesters + 1):
+        document[f"semester_{semester}"] = {
+            "term": f"Term {semester}",
+            "courses": [
+                synthetic_course(semester * 100 + i, events_per_course, rng) for i in range(courses)
+            ]
+        }
+    return document
+
+
+def use_workdir(workdir, student_data=None):
+    # Points every on-disk store at workdir; must run before building the API.
+    os.environ["STUDENT_DATA_FILE"] = os.path.join(workdir, "student_data.json")
+    os.environ["STUDENT_DB_FILE"] = os.path.join(workdir, "student_data.db")
+    os.environ["ANALYSIS_CACHE_FILE"] = os.path.join(workdir, "analysis_cache.db")
+    with open(os.environ["STUDENT_DATA_FILE"], "w") as f:
+        json.dump(student_data or {}, f, indent=2)
+
+
+def build_api(model=None, firestore=None, max_concurrency=None):
+    from app import StudentAssistantAPI, StudentDataManager, FirebaseClient, GeminiClient
+    from scheduler import RequestScheduler
+
+    model = model or FakeGenerativeModel()
+    scheduler = RequestScheduler(max_concurrency=max_concurrency) if max_concurrency else None
+    return StudentAssistantAPI(
+        gemini_client=GeminiClient(model=model, scheduler=scheduler),
+        student_data_manager=StudentDataManager(FirebaseClient(db=firestore or FakeFirestore()))
+    )
+
+
+def add_output_args(parser):
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a JSON file from an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed p95 slowdown against --baseline before failing (default 0.2 = 20%%)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+
+
+def compare(results, baseline, tolerance, floor_ms=1.0):
+    # A result regresses when its p95 grew by more than `tolerance` and by
+    # more than `floor_ms`, which keeps sub-millisecond noise out.
+    previous = {result["name"]: result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get(result["name"], {}).get("p95_ms")
+        new = result.get("p95_ms")
+        if old is None or new is None:
+            continue
+        if new > old * (1 + tolerance) and new - old > floor_ms:
+            regressions.append(f"{result['name']}: p95 {old} ms -> {new} ms")
+    return regressions
+
+
+def finish(benchmark, results, args, summary=None):
+    report = {
+        "benchmark": benchmark,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": vars(args),
+        "peak_rss_mb": peak_rss_mb(),
+        "summary": summary or {},
+        "results": results
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        columns = ["name", "count", "errors", "p50_ms", "p95_ms", "p99_ms", "throughput_rps"]
+        print(" ".join(f"{column:>14}" if i else f"{column:<34}" for i, column in enumerate(columns)))
+        for result in results:
+            print(" ".join(
+                f"{str(result.get(column, '')):>14}" if i else f"{result['name']:<34}"
+                for i, column in enumerate(columns)
+            ))
+        for key, value in {**(summary or {}), "peak_rss_mb": report["peak_rss_mb"]}.items():
+            print(f"{key}: {value}")
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
+
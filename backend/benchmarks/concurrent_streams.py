@@ -0,0 +1,169 @@
+"""Concurrent chat streams per process: Flask on a thread pool vs. the ASGI app.
+
+The sync run models a gunicorn gthread worker: each stream holds one of
+--threads threads until Gemini finishes. The async run drives asgi.py
+directly on one event loop. Both use FakeGenerativeModel, so the numbers
+measure the server, not Gemini.
+
+    python benchmarks/concurrent_streams.py --streams 500 --threads 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import FakeGenerativeModel, build_api as build_fake_api, percentile, use_workdir
+
+
+def build_api(args, workdir):
+    os.environ["RESPONSE_CACHE_MAX_BYTES"] = "0"
+    use_workdir(workdir)
+    model = FakeGenerativeModel(
+        text="x" * (args.chunks * 40), latency=args.latency, chunks=args.chunks, chunk_interval=args.interval
+    )
+    return build_fake_api(model, max_concurrency=args.streams)
+
+
+class PeakSampler:
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.peak_streams = 0
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(0.005):
+            self.peak_streams = max(self.peak_streams, self.scheduler.active)
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def summarize(mode, ttfb, durations, wall, sampler, streams):
+    return {
+        "mode": mode,
+        "streams": streams,
+        "completed": len(durations),
+        "wall_s": round(wall, 3),
+        "streams_per_s": round(len(durations) / wall, 1),
+        "peak_concurrent_streams": sampler.peak_streams,
+        "peak_threads": sampler.peak_threads,
+        "ttfb_p50_ms": round(percentile(ttfb, 50) * 1000, 1),
+        "ttfb_p95_ms": round(percentile(ttfb, 95) * 1000, 1),
+        "ttfb_p99_ms": round(percentile(ttfb, 99) * 1000, 1),
+        "duration_p50_ms": round(percentile(durations, 50) * 1000, 1)
+    }
+
+
+def run_sync(api, args):
+    payload = {"prompt": "How should I plan my week?", "task_type": "general"}
+    ttfb, durations = [], []
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def one_stream():
+        client = api.app.test_client()
+        response = client.post('/api/chat', json=payload, buffered=False)
+        first = None
+        for chunk in response.response:
+            if first is None and chunk:
+                first = time.perf_counter() - started
+        response.close()
+        with lock:
+            ttfb.append(first)
+            durations.append(time.perf_counter() - started)
+
+    with PeakSampler(api.gemini_client.scheduler) as sampler:
+        with ThreadPoolExecutor(max_workers=args.threads) as pool:
+            for _ in range(args.streams):
+                pool.submit(one_stream)
+    return summarize(f"sync ({args.threads} threads)", ttfb, durations, time.perf_counter() - started,
+                     sampler, args.streams)
+
+
+def run_async(api, args):
+    from asgi import AsyncStudentAssistantAPI
+
+    app = AsyncStudentAssistantAPI(api, max_threads=args.threads)
+    body = json.dumps({"prompt": "How should I plan my week?", "task_type": "general"}).encode()
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/chat",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+        "http_version": "1.1"
+    }
+    ttfb, durations = [], []
+
+    async def one_stream(started):
+        finished = asyncio.Event()
+        state = {"sent": False, "first": None}
+
+        async def receive():
+            if not state["sent"]:
+                state["sent"] = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] != "http.response.body":
+                return
+            if state["first"] is None and message.get("body"):
+                state["first"] = time.perf_counter() - started
+            if not message.get("more_body"):
+                finished.set()
+
+        await app(dict(scope), receive, send)
+        ttfb.append(state["first"])
+        durations.append(time.perf_counter() - started)
+
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(*(one_stream(started) for _ in range(args.streams)))
+        return started
+
+    with PeakSampler(api.gemini_client.scheduler) as sampler:
+        started = asyncio.run(main())
+        wall = time.perf_counter() - started
+    app.executor.shutdown()
+    return summarize("async (asgi)", ttfb, durations, wall, sampler, args.streams)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--streams", type=int, default=500, help="concurrent chat streams to open")
+    parser.add_argument("--threads", type=int, default=32, help="threads per sync worker / ASGI thread pool")
+    parser.add_argument("--chunks", type=int, default=10, help="chunks per streamed answer")
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between chunks")
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds before the first chunk")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = [run_sync(build_api(args, workdir), args), run_async(build_api(args, workdir), args)]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        print(f"{result['mode']}:")
+        for key, value in result.items():
+            if key != "mode":
+                print(f"  {key:<24} {value}")
+
+
+if __name__ == "__main__":
+    main()
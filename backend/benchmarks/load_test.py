@@ -0,0 +1,191 @@
+"""Load test for every route in StudentAssistantAPI.setup_routes.
+
+Runs the Flask app in-process on FakeGenerativeModel and FakeFirestore and
+sends --requests requests per scenario from --concurrency threads. For each
+scenario it reports p50/p95/p99 latency (streamed bodies are read to the
+end), throughput and non-2xx responses, plus the peak RSS of the process.
+
+    python benchmarks/load_test.py --concurrency 16 --requests 400 --output load.json
+    python benchmarks/load_test.py --baseline load.json
+"""
+import argparse
+import io
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import (
+    FakeFirestore, FakeGenerativeModel, add_output_args, build_api, finish, latency_summary,
+    synthetic_course, synthetic_document, use_workdir
+)
+
+EMAIL = "load@studysync.test"
+
+
+def scenarios(job_id):
+    # name -> (method, path, request kwargs for the i-th request)
+    course = synthetic_course(7, 40)
+    small_course = synthetic_course(8, 5)
+    return {
+        "health": ("GET", "/api/health", lambda i: {}),
+        "tasks": ("GET", "/api/tasks", lambda i: {}),
+        "stats": ("GET", "/api/stats", lambda i: {}),
+        "metrics": ("GET", "/metrics", lambda i: {}),
+        "chat_stream": ("POST", "/api/chat", lambda i: {"json": {
+            "prompt": f"What is due this week? ({i})", "task_type": "todo", "email": EMAIL, "cache": False
+        }}),
+        "chat_sse": ("POST", "/api/chat", lambda i: {"json": {
+            "prompt": f"Plan my exams ({i})", "task_type": "exams", "email": EMAIL, "cache": False,
+            "stream_mode": "sse"
+        }}),
+        "chat_no_stream_cached": ("POST", "/api/chat", lambda i: {"json": {
+            "prompt": f"Study tip number {i % 20}", "task_type": "study_tips", "no_stream": True
+        }}),
+        "chat_session": ("POST", "/api/chat", lambda i: {"json": {
+            "prompt": f"And after that? ({i})", "task_type": "grades", "email": EMAIL,
+            "session_id": f"load-session-{i % 8}", "no_stream": True
+        }}),
+        "syllabus_upload": ("POST", "/api/chat", lambda i: {
+            "data": {"action": "analyze_syllabus", "file": (io.BytesIO(b"%PDF-1.4 load " + str(i).encode()), "s.pdf")},
+            "content_type": "multipart/form-data"
+        }),
+        "syllabus_upload_sse": ("POST", "/api/chat", lambda i: {
+            "data": {"action": "analyze_syllabus", "stream_mode": "sse",
+                     "file": (io.BytesIO(b"%PDF-1.4 sse " + str(i).encode()), "s.pdf")},
+            "content_type": "multipart/form-data"
+        }),
+        "import_syllabi": ("POST", "/api/import_syllabi", lambda i: {
+            "data": {"email": EMAIL, "semester_num": 2, "files": [
+                (io.BytesIO(b"%PDF-1.4 import " + f"{i}-{j}".encode()), f"s{j}.pdf") for j in range(4)
+            ]},
+            "content_type": "multipart/form-data"
+        }),
+        "syllabus_job": ("GET", f"/api/syllabus_jobs/{job_id}", lambda i: {}),
+        "fetch_data_firestore": ("GET", "/api/fetch_data", lambda i: {"query_string": {"email": EMAIL}}),
+        "fetch_data_file": ("GET", "/api/fetch_data", lambda i: {}),
+        "get_student_data_file": ("GET", "/api/get_student_data", lambda i: {}),
+        "get_student_data_db": ("GET", "/api/get_student_data", lambda i: {"query_string": {"email": EMAIL}}),
+        "save_user": ("POST", "/api/save_user", lambda i: {"json": {
+            "email": f"user{i}@studysync.test", "name": f"User {i}"
+        }}),
+        "add_semester": ("POST", "/api/add_semester", lambda i: {"json": {
+            "email": f"user{i}@studysync.test", "semester_num": 1, "term_name": "Spring"
+        }}),
+        "add_courses": ("POST", "/api/add_courses", lambda i: {"json": {
+            "email": f"user{i}@studysync.test", "semester_num": 1, "courses": [small_course]
+        }}),
+        "bulk_write": ("POST", "/api/bulk_write", lambda i: {"json": {"users": [
+            {"email": f"bulk{i}-{j}@studysync.test", "name": f"Bulk {j}",
+             "semesters": [{"semester_num": 1, "term_name": "Fall", "courses": [small_course]}]}
+            for j in range(10)
+        ]}}),
+        "sync_data": ("POST", "/api/sync_data", lambda i: {"json": {"email": EMAIL}}),
+        "save_syllabus_data_db": ("POST", "/api/save_syllabus_data", lambda i: {"json": {
+            "email": EMAIL, "semester_num": 1, "data": {**course, "course_name": f"LOAD {i % 10}"}
+        }}),
+        "save_syllabus_data_file": ("POST", "/api/save_syllabus_data", lambda i: {"json": {
+            "data": {**course, "course_name": f"LOAD {i % 10}"}
+        }}),
+        "events": ("GET", "/api/events", lambda i: {"query_string": {
+            "email": EMAIL, "from": "2025-02-01", "to": "2025-03-01"
+        }}),
+        "events_upcoming": ("GET", "/api/events/upcoming", lambda i: {"query_string": {
+            "email": EMAIL, "from": "2025-02-01", "n": 10
+        }}),
+        "events_clashes": ("GET", "/api/events/clashes", lambda i: {"query_string": {"email": EMAIL}}),
+        "events_ics": ("GET", "/api/events.ics", lambda i: {"query_string": {"email": EMAIL}}),
+        "grades": ("GET", "/api/grades", lambda i: {"query_string": {"email": EMAIL, "target": 85}}),
+        "grades_what_if": ("POST", "/api/grades", lambda i: {"json": {
+            "email": EMAIL, "target": 90, "what_if": {"SYN 1100 Synthetic Course 100": {"exam": 70 + i % 30}}
+        }})
+    }
+
+
+def run_scenario(app, name, method, path, make_kwargs, requests, concurrency):
+    local = threading.local()
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+
+    def one(i):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        started = time.perf_counter()
+        response = client.open(path, method=method, **make_kwargs(i))
+        for _ in response.response:
+            pass
+        response.close()
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if response.status_code >= 300:
+                errors[response.status_code] = errors.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    return {
+        "name": name,
+        **latency_summary(latencies),
+        "errors": sum(errors.values()),
+        "status_counts": {str(status): count for status, count in sorted(errors.items())},
+        "throughput_rps": round(len(latencies) / wall, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--only", help="comma-separated scenario names")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake Gemini seconds before the first chunk")
+    parser.add_argument("--chunks", type=int, default=8, help="fake Gemini chunks per answer")
+    parser.add_argument("--chunk-interval", type=float, default=0.01, help="fake Gemini seconds between chunks")
+    parser.add_argument("--firestore-latency", type=float, default=0.005, help="fake Firestore seconds per round-trip")
+    parser.add_argument("--events", type=int, default=200, help="synthetic events per course")
+    add_output_args(parser)
+    args = parser.parse_args()
+
+    document = synthetic_document(EMAIL, events_per_course=args.events)
+    answer = json.dumps(synthetic_course(1, 10))
+    with tempfile.TemporaryDirectory() as workdir:
+        use_workdir(workdir, document)
+        firestore = FakeFirestore(latency=args.firestore_latency)
+        firestore.collection("user-data").document(EMAIL).set(document)
+        model = FakeGenerativeModel(
+            text=answer, latency=args.latency, chunks=args.chunks, chunk_interval=args.chunk_interval
+        )
+        api = build_api(model, firestore, max_concurrency=max(8, args.concurrency))
+        client = api.app.test_client()
+        client.post('/api/sync_data', json={"email": EMAIL})
+        job = client.post('/api/chat', data={
+            "action": "analyze_syllabus", "file": (io.BytesIO(b"%PDF-1.4 seed"), "seed.pdf")
+        }, content_type="multipart/form-data").get_json()
+
+        selected = scenarios(job["job_id"])
+        if args.only:
+            names = args.only.split(",")
+            selected = {name: selected[name] for name in names}
+
+        results = []
+        started = time.perf_counter()
+        for name, (method, path, make_kwargs) in selected.items():
+            results.append(run_scenario(api.app, name, method, path, make_kwargs, args.requests, args.concurrency))
+        summary = {
+            "scenarios": len(results),
+            "total_requests": sum(result["count"] for result in results),
+            "wall_s": round(time.perf_counter() - started, 2),
+            "gemini_calls": model.calls,
+            "firestore_reads": firestore.reads,
+            "firestore_writes": firestore.writes
+        }
+        api.syllabus_jobs.shutdown()
+    finish("load_test", results, args, summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Microbenchmarks for the student data paths on large synthetic documents.
+
+Times StudentDataManager.save_syllabus_data (JSON file and SQLite paths),
+get_student_data_from_file / get_student_data_bytes with warm and cold
+caches, the grade and event queries built on them, and Firestore-to-SQLite
+syncs (full replace, one changed course, nothing changed). The default
+document has 2 semesters x 8 courses x 400 events = 6400 events.
+
+    python benchmarks/microbench.py --iterations 50 --output micro.json
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import add_output_args, build_api, finish, latency_summary, synthetic_course, synthetic_document, use_workdir
+
+EMAIL = "micro@studysync.test"
+SYNC_EMAIL = "sync@studysync.test"
+
+
+def measure(name, fn, iterations, setup=None):
+    latencies = []
+    for i in range(iterations):
+        if setup is not None:
+            setup(i)
+        started = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - started)
+    summary = latency_summary(latencies)
+    return {"name": name, **summary, "throughput_rps": round(len(latencies) / sum(latencies), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--semesters", type=int, default=2)
+    parser.add_argument("--courses", type=int, default=8, help="courses per semester")
+    parser.add_argument("--events", type=int, default=400, help="events per course")
+    add_output_args(parser)
+    args = parser.parse_args()
+
+    document = synthetic_document(EMAIL, args.semesters, args.courses, args.events)
+    course_events = args.events
+    with tempfile.TemporaryDirectory() as workdir:
+        use_workdir(workdir, document)
+        manager = build_api().student_data_manager
+        manager.user_store.put_user(document)
+        path = os.environ["STUDENT_DATA_FILE"]
+        firestore_ref = manager.firebase_client.db.collection("user-data").document(SYNC_EMAIL)
+        firestore_ref.set({**document, "email": SYNC_EMAIL})
+
+        def touch(i):
+            # Bumps the file's mtime so the next read misses the cache.
+            os.utime(path, ns=(time.time_ns(), time.time_ns() + i))
+
+        def new_course(i):
+            return synthetic_course(10000 + i, course_events)
+
+        def forget_sync(i):
+            manager.user_store.put_user({**document, "email": SYNC_EMAIL})
+
+        def change_one_course(i):
+            courses = [existing_course(i)] + document["semester_1"]["courses"][1:]
+            firestore_ref.update({"semester_1.courses": courses})
+
+        def sync(i):
+            manager.sync.apply(SYNC_EMAIL, firestore_ref.get())
+
+        def existing_course(i):
+            return {**synthetic_course(101, course_events), "course_name": document["semester_1"]["courses"][0]["course_name"]}
+
+        results = [
+            measure("get_student_data_from_file_warm", lambda i: manager.get_student_data_from_file(), args.iterations),
+            measure("get_student_data_from_file_cold", lambda i: manager.get_student_data_from_file(),
+                    args.iterations, setup=touch),
+            measure("get_student_data_bytes_warm", lambda i: manager.get_student_data_bytes(), args.iterations),
+            measure("get_student_data_bytes_cold", lambda i: manager.get_student_data_bytes(),
+                    args.iterations, setup=touch),
+            measure("save_syllabus_data_file_update",
+                    lambda i: manager.save_syllabus_data(existing_course(i), semester_num=1), args.iterations),
+            measure("save_syllabus_data_file_insert",
+                    lambda i: manager.save_syllabus_data(new_course(i), semester_num=2), args.iterations),
+            measure("save_syllabus_data_db_update",
+                    lambda i: manager.save_syllabus_data(existing_course(i), email=EMAIL, semester_num=1),
+                    args.iterations),
+            measure("save_syllabus_data_db_insert",
+                    lambda i: manager.save_syllabus_data(new_course(i), email=EMAIL, semester_num=2),
+                    args.iterations),
+            measure("get_local_user_data_db", lambda i: manager.get_local_user_data(EMAIL), args.iterations),
+            measure("compute_grades_db", lambda i: manager.compute_grades(EMAIL, target=85), args.iterations),
+            measure("event_range_db", lambda i: manager.get_event_index(EMAIL).range("2025-02-01", "2025-03-01"),
+                    args.iterations),
+            measure("event_clashes_db", lambda i: manager.get_event_index(EMAIL).clashes(), args.iterations),
+            measure("sync_full_replace", sync, args.iterations, setup=forget_sync),
+            measure("sync_one_course_changed", sync, args.iterations, setup=change_one_course),
+            measure("sync_unchanged", sync, args.iterations)
+        ]
+        loaded = manager.get_student_data_from_file()
+        summary = {
+            "events_per_document": sum(
+                len(course.get("schedule", []))
+                for key, semester in loaded.items() if key.startswith("semester_")
+                for course in semester.get("courses", [])
+            ),
+            "file_bytes": os.path.getsize(path)
+        }
+    finish("microbench", results, args, summary)
+
+
+if __name__ == "__main__":
+    main()
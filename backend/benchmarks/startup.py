@@ -0,0 +1,93 @@
+"""Cold-start latency: importing app.py and answering the first /api/health.
+
+Each run starts a fresh interpreter, so module caches are cold apart from
+the OS page cache. Exits non-zero when the median of either measurement is
+over its limit, or when vertexai / firebase_admin were imported before the
+first health check.
+
+    python benchmarks/startup.py --runs 5 --max-import-ms 500 --max-health-ms 1000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("vertexai", "firebase_admin", "google.cloud.firestore", "google.cloud.aiplatform")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+response = flask_app.test_client().get('/api/health')
+answered = time.perf_counter()
+print(json.dumps({
+    "status": response.status_code,
+    "import_ms": (imported - started) * 1000,
+    "create_ms": (created - imported) * 1000,
+    "first_health_ms": (answered - started) * 1000,
+    "heavy_modules": sorted(m for m in sys.modules if m.startswith(%r))
+}))
+"""
+
+
+def run_once(workdir):
+    env = dict(
+        os.environ,
+        PYTHONPATH=BACKEND_DIR,
+        STUDENT_DATA_FILE=os.path.join(workdir, "student_data.json"),
+        STUDENT_DB_FILE=os.path.join(workdir, "student_data.db"),
+        ANALYSIS_CACHE_FILE=os.path.join(workdir, "analysis_cache.db")
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE % (HEAVY_MODULES,)],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=500.0)
+    parser.add_argument("--max-health-ms", type=float, default=1000.0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        runs = [run_once(workdir) for _ in range(args.runs)]
+
+    result = {
+        "runs": args.runs,
+        "import_ms": round(statistics.median(run["import_ms"] for run in runs), 1),
+        "create_ms": round(statistics.median(run["create_ms"] for run in runs), 1),
+        "first_health_ms": round(statistics.median(run["first_health_ms"] for run in runs), 1),
+        "heavy_modules": sorted({module for run in runs for module in run["heavy_modules"]})
+    }
+    failures = []
+    if any(run["status"] != 200 for run in runs):
+        failures.append("health check did not return 200")
+    if result["import_ms"] > args.max_import_ms:
+        failures.append(f"import took {result['import_ms']} ms (limit {args.max_import_ms} ms)")
+    if result["first_health_ms"] > args.max_health_ms:
+        failures.append(f"first health check after {result['first_health_ms']} ms (limit {args.max_health_ms} ms)")
+    if result["heavy_modules"]:
+        failures.append(f"imported at startup: {', '.join(result['heavy_modules'])}")
+    result["failures"] = failures
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:<16} {value}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from storage import SQLiteStore
+
+MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic, max_bytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._entries.get(key, MISSING)
+            if entry is not MISSING:
+                expires_at, value, _ = entry
+                if expires_at is None or expires_at > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, MISSING)
+        if entry is not MISSING:
+            self._bytes -= entry[2]
+        return entry
+
+    def set(self, key, value):
+        expires_at = self.clock() + self.ttl if self.ttl else None
+        size = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                return
+            self._entries[key] = (expires_at, value, size)
+            self._bytes += size
+            while len(self._entries) > self.maxsize or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        # Like get(), an expired entry counts as missing.
+        with self._lock:
+            entry = self._remove(key)
+        if entry is MISSING or (entry[0] is not None and entry[0] <= self.clock()):
+            return default
+        return entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+def response_cache_key(prompt, task_type, attachment=None, context=None):
+    normalized = re.sub(r"\s+", " ", prompt).strip().lower().rstrip("?!. ")
+    attachment_hash = hashlib.sha256(attachment.encode()).hexdigest() if attachment else None
+    return (normalized, task_type, attachment_hash, context)
+
+
+ANALYSIS_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    digest TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    data TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (digest, prompt_version)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS analyses_by_access ON analyses (accessed_at);
+"""
+
+
+# Syllabus analysis results keyed by the SHA-256 of the PDF and the prompt
+# version. Least recently used rows are dropped once the stored JSON
+# exceeds max_bytes.
+class AnalysisCache(SQLiteStore):
+    schema = ANALYSIS_CACHE_SCHEMA
+
+    def __init__(self, path="analysis_cache.db", max_bytes=64 * 1024 * 1024):
+        super().__init__(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest, prompt_version):
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT data FROM analyses WHERE digest = ? AND prompt_version = ?", (digest, prompt_version)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE analyses SET accessed_at = ? WHERE digest = ? AND prompt_version = ?",
+                    (time.time(), digest, prompt_version),
+                )
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, digest, prompt_version, analysis):
+        data = json.dumps(analysis, separators=(",", ":"))
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analyses (digest, prompt_version, data, size, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (digest, prompt_version, data, len(data), time.time()),
+            )
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM analyses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            freed = 0
+            expired = []
+            for key_digest, key_version, size in conn.execute(
+                "SELECT digest, prompt_version, size FROM analyses ORDER BY accessed_at"
+            ):
+                if total - freed <= self.max_bytes:
+                    break
+                expired.append((key_digest, key_version))
+                freed += size
+            conn.executemany("DELETE FROM analyses WHERE digest = ? AND prompt_version = ?", expired)
+
+    def stats(self):
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM analyses"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
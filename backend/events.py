@@ -0,0 +1,221 @@
+import hashlib
+import heapq
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from operator import itemgetter
+
+from cache import LRUCache, MISSING
+
+DEADLINE_TYPES = ("assignment", "quiz", "exam", "project")
+
+_entry_date = itemgetter(0)
+_entry_order = itemgetter(0, 1, 2, 3)
+
+
+def parse_class_time(value):
+    try:
+        parsed = datetime.strptime(value.strip(), "%I:%M %p")
+    except (AttributeError, ValueError):
+        return None
+    return parsed.hour * 60 + parsed.minute
+
+
+# Sorted, merged schedule events across all of one user's courses. Entries
+# are (date, course_name, semester, position, event) tuples, kept both in
+# one list and per event type so range queries are two bisects. Instances
+# are never mutated once published: with_courses() returns an updated copy.
+class UserEvents:
+    def __init__(self, version, entries=None, by_type=None, courses=None):
+        self.version = version
+        self.entries = entries if entries is not None else []
+        self.by_type = by_type if by_type is not None else {}
+        self.courses = courses if courses is not None else {}
+
+    @classmethod
+    def from_document(cls, document, version):
+        index = cls(version)
+        courses = [
+            (semester_key, course)
+            for semester_key, semester in document.items() if semester_key.startswith("semester_")
+            for course in semester.get("courses", [])
+        ]
+        index._merge(index._course_entries(courses))
+        return index
+
+    def _course_entries(self, courses):
+        entries = []
+        for semester_key, course in courses:
+            course_name = course.get("course_name", "")
+            self.courses[(semester_key, course_name)] = course
+            for position, event in enumerate(course.get("schedule", [])):
+                entries.append((event.get("date", ""), course_name, semester_key, position, event))
+        entries.sort(key=_entry_order)
+        return entries
+
+    def _merge(self, new_entries):
+        self.entries = list(heapq.merge(self.entries, new_entries, key=_entry_order))
+        new_by_type = {}
+        for entry in new_entries:
+            new_by_type.setdefault(entry[4].get("type", ""), []).append(entry)
+        for event_type, entries in new_by_type.items():
+            self.by_type[event_type] = list(heapq.merge(self.by_type.get(event_type, []), entries, key=_entry_order))
+
+    def with_courses(self, semester_key, courses, version, replace_semester=False):
+        names = {course.get("course_name", "") for course in courses}
+
+        def keep(semester, course_name):
+            return semester != semester_key or (not replace_semester and course_name not in names)
+
+        index = UserEvents(
+            version,
+            [entry for entry in self.entries if keep(entry[2], entry[1])],
+            {
+                event_type: [entry for entry in entries if keep(entry[2], entry[1])]
+                for event_type, entries in self.by_type.items()
+            },
+            {key: course for key, course in self.courses.items() if keep(*key)}
+        )
+        index._merge(index._course_entries([(semester_key, course) for course in courses]))
+        return index
+
+    @staticmethod
+    def _as_event(entry):
+        date, course_name, semester_key, _, event = entry
+        return {**event, "course_name": course_name, "semester": semester_key}
+
+    def range(self, start=None, end=None, event_type=None):
+        entries = self.by_type.get(event_type, []) if event_type else self.entries
+        lo = bisect_left(entries, start, key=_entry_date) if start else 0
+        hi = bisect_right(entries, end, key=_entry_date) if end else len(entries)
+        return [self._as_event(entry) for entry in entries[lo:hi]]
+
+    def upcoming(self, today, limit, event_types=DEADLINE_TYPES):
+        merged = []
+        for event_type in event_types:
+            entries = self.by_type.get(event_type, [])
+            lo = bisect_left(entries, today, key=_entry_date)
+            merged.extend(entries[lo:lo + limit])
+        merged.sort(key=_entry_order)
+        return [self._as_event(entry) for entry in merged[:limit]]
+
+    def clashes(self):
+        # Events on the same day from different courses whose class hours
+        # overlap. Each day's courses are swept in start-time order, keeping
+        # the courses still in session, so only overlapping courses are
+        # paired. Pairs come out in index order; an event in several pairs is
+        # converted once.
+        hours = {}
+        for key, course in self.courses.items():
+            start = parse_class_time(course.get("start_time"))
+            end = parse_class_time(course.get("end_time"))
+            if start is not None and end is not None:
+                hours[key] = (start, end)
+
+        clashes = []
+        events = {}
+        i = 0
+        while i < len(self.entries):
+            j = i
+            by_course = {}
+            while j < len(self.entries) and self.entries[j][0] == self.entries[i][0]:
+                key = (self.entries[j][2], self.entries[j][1])
+                if key in hours:
+                    by_course.setdefault(key, []).append(j)
+                j += 1
+
+            pairs = []
+            active = []
+            for key in sorted(by_course, key=hours.get):
+                start = hours[key][0]
+                active = [other for other in active if hours[other][1] > start]
+                for other in active:
+                    if other[1] != key[1]:
+                        pairs.extend(
+                            (a, b) if a < b else (b, a) for a in by_course[other] for b in by_course[key]
+                        )
+                active.append(key)
+            pairs.sort()
+            for a, b in pairs:
+                for k in (a, b):
+                    if k not in events:
+                        events[k] = self._as_event(self.entries[k])
+                clashes.append({"date": self.entries[a][0], "events": [events[a], events[b]]})
+            i = j
+        return clashes
+
+
+class EventIndex:
+    def __init__(self, max_users=1024):
+        self._users = LRUCache(maxsize=max_users)
+
+    def get(self, key, version, load_document):
+        index = self._users.get(key)
+        if index is MISSING or index.version != version:
+            index = UserEvents.from_document(load_document(), version)
+            self._users.set(key, index)
+        return index
+
+    def update_courses(self, key, semester_key, courses, previous_version, version, replace_semester=False):
+        index = self._users.get(key)
+        if index is MISSING:
+            return
+        if index.version != previous_version:
+            self._users.pop(key)
+            return
+        self._users.set(key, index.with_courses(semester_key, courses, version, replace_semester))
+
+    def stats(self):
+        return self._users.stats()
+
+
+def _ics_escape(value):
+    return (
+        str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+    )
+
+
+def _ics_fold(line):
+    data = line.encode()
+    if len(data) <= 75:
+        return line + "\r\n"
+    parts = []
+    while data:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(data))
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode())
+        data = data[cut:]
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def iter_ics(index, calendar_name="StudySync", uid_seed=""):
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield _ics_fold("BEGIN:VCALENDAR")
+    yield _ics_fold("VERSION:2.0")
+    yield _ics_fold("PRODID:-//StudySync//Schedule//EN")
+    yield _ics_fold(f"X-WR-CALNAME:{_ics_escape(calendar_name)}")
+    for date, course_name, semester_key, position, event in index.entries:
+        day = date.replace("-", "")
+        if len(day) != 8 or not day.isdigit():
+            continue
+        uid = hashlib.sha1(f"{uid_seed}|{semester_key}|{course_name}|{position}|{date}".encode()).hexdigest()
+        course = index.courses.get((semester_key, course_name), {})
+        start = parse_class_time(course.get("start_time"))
+        end = parse_class_time(course.get("end_time"))
+
+        yield _ics_fold("BEGIN:VEVENT")
+        yield _ics_fold(f"UID:{uid}@studysync")
+        yield _ics_fold(f"DTSTAMP:{stamp}")
+        if event.get("type") == "class" and start is not None and end is not None:
+            yield _ics_fold(f"DTSTART:{day}T{start // 60:02d}{start % 60:02d}00")
+            yield _ics_fold(f"DTEND:{day}T{end // 60:02d}{end % 60:02d}00")
+        else:
+            yield _ics_fold(f"DTSTART;VALUE=DATE:{day}")
+        yield _ics_fold(f"SUMMARY:{_ics_escape(f'{course_name}: ' + event.get('title', ''))}")
+        if event.get("description"):
+            yield _ics_fold(f"DESCRIPTION:{_ics_escape(event['description'])}")
+        if event.get("type"):
+            yield _ics_fold(f"CATEGORIES:{_ics_escape(event['type'].upper())}")
+        yield _ics_fold("END:VEVENT")
+    yield _ics_fold("END:VCALENDAR")
@@ -0,0 +1,283 @@
+import datetime
+import json
+import re
+
+from events import parse_class_time
+
+SCHEDULE_TYPES = ("class", "assignment", "quiz", "exam", "project", "other")
+COURSE_FIELDS = ("course_name", "instructor_name", "start_time", "end_time", "marks_distribution")
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+MARKS_TOLERANCE = 1.0
+
+
+# Scans one top-level JSON object as it arrives, reporting each member as
+# soon as its value is complete, and each object element of the arrays
+# named in `stream_arrays` as soon as that element closes. Anything before
+# the opening brace (a ```json fence, say) and after the closing one is
+# ignored. A member or element that fails to parse is reported as an
+# error and skipped; scanning carries on with the next one.
+class JSONObjectScanner:
+    def __init__(self, stream_arrays=("schedule",)):
+        self.stream_arrays = stream_arrays
+        self.text = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.state = "start"
+        self.key = None
+        self.token_start = None
+        self.item_start = None
+        self.array = None
+
+    @property
+    def done(self):
+        return self.state == "done"
+
+    def _loads(self, items, kind, key, start, end):
+        try:
+            items.append((kind, key, json.loads(self.text[start:end])))
+        except ValueError as e:
+            items.append(("error", key, f"{e.msg} in {self.text[start:end][:60]!r}"))
+
+    def feed(self, chunk):
+        items = []
+        self.text += chunk
+        text = self.text
+        for i in range(self.pos, len(text)):
+            c = text[i]
+            if self.state == "done":
+                break
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+                    if self.state == "in_key":
+                        try:
+                            self.key = json.loads(text[self.token_start:i + 1])
+                        except ValueError:
+                            self.key = None
+                        self.token_start = None
+                        self.state = "colon"
+                continue
+            if self.state == "start":
+                if c == "{":
+                    self.depth = 1
+                    self.state = "key"
+                continue
+            if c == '"':
+                self.in_string = True
+                if self.state == "key":
+                    self.token_start = i
+                    self.state = "in_key"
+                elif self.state == "value":
+                    self.token_start = i
+                    self.state = "in_value"
+                continue
+            if c.isspace():
+                continue
+
+            if self.depth == 1:
+                if self.state == "colon":
+                    if c == ":":
+                        self.state = "value"
+                    continue
+                if self.state == "value":
+                    self.token_start = i
+                    self.state = "in_value"
+                    if c in "{[":
+                        self.depth += 1
+                        if c == "[" and self.key in self.stream_arrays:
+                            # Elements are reported one by one; the array
+                            # as a whole is never kept.
+                            self.array = self.key
+                            self.token_start = None
+                    continue
+                if c in ",}":
+                    if self.state == "in_value" and self.token_start is not None:
+                        self._loads(items, "field", self.key, self.token_start, i)
+                    self.token_start = None
+                    self.state = "done" if c == "}" else "key"
+                continue
+
+            if c in "{[":
+                if self.array is not None and self.depth == 2 and c == "{":
+                    self.item_start = i
+                self.depth += 1
+            elif c in "}]":
+                self.depth -= 1
+                if self.array is not None and self.depth == 2 and self.item_start is not None:
+                    self._loads(items, "item", self.array, self.item_start, i + 1)
+                    self.item_start = None
+                if self.depth == 1:
+                    if self.array is None:
+                        self._loads(items, "field", self.key, self.token_start, i + 1)
+                    self.array = None
+                    self.token_start = None
+                    self.state = "after_value"
+
+        # Keep only the text that an unfinished member or element still needs.
+        keep = min((start for start in (self.token_start, self.item_start) if start is not None), default=len(text))
+        self.text = text[keep:]
+        for name in ("token_start", "item_start"):
+            if getattr(self, name) is not None:
+                setattr(self, name, getattr(self, name) - keep)
+        self.pos = len(self.text)
+        return items
+
+
+def validate_event(entry):
+    # Returns (event or None, problems). Events without a valid date are
+    # dropped; an unknown type becomes "other".
+    if not isinstance(entry, dict):
+        return None, ["not an object"]
+    problems = []
+    date = entry.get("date")
+    try:
+        if not isinstance(date, str) or not DATE_PATTERN.match(date):
+            raise ValueError
+        datetime.date.fromisoformat(date)
+    except ValueError:
+        return None, [f"invalid date {date!r}"]
+
+    event_type = str(entry.get("type", "")).strip().lower()
+    if event_type not in SCHEDULE_TYPES:
+        problems.append(f"unknown type {entry.get('type')!r}, using 'other'")
+        event_type = "other"
+    event = {
+        **entry,
+        "date": date,
+        "type": event_type,
+        "title": str(entry.get("title") or ""),
+        "description": str(entry.get("description") or "")
+    }
+    return event, problems
+
+
+def _percentage(value):
+    if isinstance(value, str):
+        value = value.strip().rstrip("%")
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def validate_marks(marks):
+    if not isinstance(marks, dict):
+        return {}, [f"marks_distribution is not an object: {marks!r}"]
+    problems = []
+    result = {}
+    for category, value in marks.items():
+        try:
+            result[category] = _percentage(value)
+        except (TypeError, ValueError):
+            problems.append(f"marks_distribution[{category!r}] is not a percentage: {value!r}")
+    total = sum(result.values())
+    if result and abs(total - 100) > MARKS_TOLERANCE:
+        problems.append(f"marks_distribution totals {total}%, expected 100%")
+    return result, problems
+
+
+def validate_field(key, value):
+    if key == "marks_distribution":
+        return validate_marks(value)
+    if key in ("start_time", "end_time"):
+        if value and parse_class_time(value) is None:
+            return value, [f"{key} {value!r} is not in HH:MM AM/PM format"]
+        return value, []
+    if key == "course_name" and (not isinstance(value, str) or not value.strip()):
+        return value, ["course_name is missing"]
+    return value, []
+
+
+# Turns streamed model output into validated syllabus data. feed() returns
+# the (event, data) items completed by a chunk of text: "course" with one
+# metadata field, "event" with one schedule entry, "warning" for anything
+# that was dropped or fixed up. result() builds the final analysis from
+# whatever arrived, marked partial if the stream broke off.
+class SyllabusExtraction:
+    def __init__(self):
+        self.scanner = JSONObjectScanner(stream_arrays=("schedule",))
+        self.course = {}
+        self.schedule = []
+        self.warnings = []
+        self.entries = 0
+
+    def _warn(self, items, message):
+        self.warnings.append(message)
+        items.append(("warning", {"message": message}))
+
+    def feed(self, text):
+        items = []
+        for kind, key, value in self.scanner.feed(text):
+            if kind == "item":
+                index = self.entries
+                self.entries += 1
+                event, problems = validate_event(value)
+                for problem in problems:
+                    self._warn(items, f"schedule[{index}]: {problem}" + ("" if event else ", entry dropped"))
+                if event is not None:
+                    self.schedule.append(event)
+                    items.append(("event", event))
+            elif kind == "field" and key is None:
+                self._warn(items, "member with an unreadable name skipped")
+            elif kind == "field":
+                value, problems = validate_field(key, value)
+                for problem in problems:
+                    self._warn(items, problem)
+                self.course[key] = value
+                items.append(("course", {key: value}))
+            elif kind == "error":
+                self._warn(items, f"{key or 'member'}: could not parse ({value}), skipped")
+        return items
+
+    def result(self, error=None):
+        partial = error is not None or not self.scanner.done
+        if partial:
+            reason = str(error) if error is not None else "response ended early"
+            self.warnings.append(f"Incomplete response ({reason}); returning what was extracted")
+        if not self.course and not self.schedule:
+            if error is not None:
+                raise error
+            raise ValueError("Could not extract syllabus data: no JSON object in response")
+
+        analysis = {key: self.course[key] for key in COURSE_FIELDS if key in self.course}
+        analysis.update((key, value) for key, value in self.course.items() if key not in analysis)
+        analysis["schedule"] = self.schedule
+        if self.warnings:
+            analysis["warnings"] = self.warnings
+        if partial:
+            analysis["partial"] = True
+        return analysis
+
+
+def extract_syllabus(chunks):
+    # Yields the SyllabusExtraction items for a stream of model chunks,
+    # then ("analysis", result). Errors mid-stream end it with the partial
+    # result instead, unless nothing at all was extracted.
+    extraction = SyllabusExtraction()
+    error = None
+    try:
+        for chunk in chunks:
+            text = getattr(chunk, "text", chunk)
+            if text:
+                yield from extraction.feed(text)
+    except Exception as e:
+        error = e
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+    yield "analysis", extraction.result(error)
+
+
+def replay_syllabus(analysis):
+    # The items extract_syllabus() would produce for a finished analysis.
+    for key, value in analysis.items():
+        if key not in ("schedule", "warnings", "partial"):
+            yield "course", {key: value}
+    for event in analysis.get("schedule", []):
+        yield "event", event
+    yield "analysis", analysis
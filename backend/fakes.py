@@ -0,0 +1,289 @@
+import asyncio
+import copy
+import datetime
+import threading
+import time
+
+from google.api_core.exceptions import NotFound
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, doc_id, data, update_time=None):
+        self.id = doc_id
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data)
+
+
+class FakeWriteResult:
+    def __init__(self, update_time):
+        self.update_time = update_time
+
+
+class FakeDocumentChange:
+    def __init__(self, type, document):
+        self.type = type
+        self.document = document
+
+
+class FakeWatch:
+    def __init__(self, db, key, callback):
+        self._db = db
+        self._key = key
+        self.callback = callback
+
+    def unsubscribe(self):
+        with self._db.lock:
+            listeners = self._db.listeners.get(self._key, [])
+            if self in listeners:
+                listeners.remove(self)
+
+
+class FakeDocumentReference:
+    def __init__(self, db, collection_name, doc_id):
+        self._db = db
+        self._collection_name = collection_name
+        self.id = doc_id
+
+    @property
+    def _key(self):
+        return (self._collection_name, self.id)
+
+    def get(self):
+        self._db.round_trip()
+        with self._db.lock:
+            self._db.reads += 1
+            return self._snapshot()
+
+    def _snapshot(self):
+        return FakeDocumentSnapshot(self.id, self._db.documents.get(self._key), self._db.update_times.get(self._key))
+
+    def on_snapshot(self, callback):
+        watch = FakeWatch(self._db, self._key, callback)
+        with self._db.lock:
+            self._db.listeners.setdefault(self._key, []).append(watch)
+        self._db.notify([self._key], "ADDED")
+        return watch
+
+    def set(self, data):
+        self._db.round_trip()
+        result = self._write(data)
+        self._db.notify([self._key])
+        return result
+
+    def _write(self, data):
+        with self._db.lock:
+            self._db.writes += 1
+            self._db.documents[self._key] = copy.deepcopy(data)
+            return FakeWriteResult(self._db.stamp(self._key))
+
+    def update(self, fields):
+        self._db.round_trip()
+        with self._db.lock:
+            self._check_exists()
+            result = self._apply_update(fields)
+        self._db.notify([self._key])
+        return result
+
+    def _check_exists(self):
+        if self._key not in self._db.documents:
+            raise NotFound(f"No document to update: {self._collection_name}/{self.id}")
+
+    def _apply_update(self, fields):
+        document = self._db.documents[self._key]
+        self._db.writes += 1
+        for path, value in fields.items():
+            target = document
+            *parents, leaf = path.split(".")
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[leaf] = copy.deepcopy(value)
+        return FakeWriteResult(self._db.stamp(self._key))
+
+
+class FakeWriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def __len__(self):
+        return len(self._writes)
+
+    def set(self, reference, data):
+        self._writes.append(("set", reference, data))
+
+    def update(self, reference, fields):
+        self._writes.append(("update", reference, fields))
+
+    def commit(self):
+        if len(self._writes) > self._db.batch_limit:
+            raise ValueError(f"Batch has {len(self._writes)} writes, limit is {self._db.batch_limit}")
+        self._db.round_trip()
+        with self._db.lock:
+            pending = set()
+            for op, reference, _ in self._writes:
+                if op == "set":
+                    pending.add(reference._key)
+                elif reference._key not in pending:
+                    reference._check_exists()
+            results = [
+                reference._write(data) if op == "set" else reference._apply_update(data)
+                for op, reference, data in self._writes
+            ]
+            self._db.commits += 1
+        keys = list(dict.fromkeys(reference._key for _, reference, _ in self._writes))
+        self._writes = []
+        self._db.notify(keys)
+        return results
+
+
+class FakeCollectionReference:
+    def __init__(self, db, name):
+        self._db = db
+        self.id = name
+
+    def document(self, doc_id):
+        return FakeDocumentReference(self._db, self.id, doc_id)
+
+
+# In-memory stand-in for firestore.client() covering the calls FirebaseClient
+# makes. Counts document reads and writes so callers can check round-trips;
+# each round-trip (get, set, update, batch commit) sleeps for `latency`.
+# Every write stamps a strictly increasing update_time, returned in a write
+# result as by the real client, and listeners added with on_snapshot() are
+# called on the writing thread once the write is applied, with
+# (snapshots, changes, read_time) like the real client.
+class FakeFirestore:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.lock = threading.RLock()
+        self.documents = {}
+        self.update_times = {}
+        self.last_update_time = None
+        self.listeners = {}
+        self.events = 0
+        self.reads = 0
+        self.writes = 0
+        self.commits = 0
+        self.batch_limit = 500
+
+    def round_trip(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def stamp(self, key):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if self.last_update_time is not None and now <= self.last_update_time:
+            now = self.last_update_time + datetime.timedelta(microseconds=1)
+        self.update_times[key] = self.last_update_time = now
+        return now
+
+    def notify(self, keys, change_type="MODIFIED"):
+        deliveries = []
+        with self.lock:
+            for key in keys:
+                watches = list(self.listeners.get(key, []))
+                if watches:
+                    snapshot = FakeDocumentReference(self, *key)._snapshot()
+                    deliveries.extend((watch, snapshot) for watch in watches)
+            self.events += len(deliveries)
+        read_time = datetime.datetime.now(datetime.timezone.utc)
+        for watch, snapshot in deliveries:
+            watch.callback([snapshot], [FakeDocumentChange(change_type, snapshot)], read_time)
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+
+
+class FakeChunk:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+# Stand-in for vertexai's GenerativeModel. Replies with `text`, after
+# `latency` seconds, or as `chunks` pieces spaced `chunk_interval` apart
+# when streaming. Exceptions queued in `errors` are raised by the next calls.
+# generate_content_async() behaves the same without blocking the event loop.
+class FakeGenerativeModel:
+    def __init__(self, text="This is a fake response.", latency=0.0, chunks=4, chunk_interval=0.0, errors=None):
+        self.text = text
+        self.latency = latency
+        self.chunks = chunks
+        self.chunk_interval = chunk_interval
+        self.errors = list(errors or [])
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def _count_call(self):
+        with self.lock:
+            self.calls += 1
+            error = self.errors.pop(0) if self.errors else None
+        if error is not None:
+            raise error
+
+    def _start(self):
+        self._count_call()
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _usage(self, contents):
+        # Roughly four characters per token, like prompts.estimate_tokens.
+        return FakeUsage(len(str(contents)) // 4, len(self.text) // 4)
+
+    def _pieces(self):
+        size = max(1, -(-len(self.text) // self.chunks))
+        return [self.text[i:i + size] for i in range(0, len(self.text), size)]
+
+    def _stream(self, contents):
+        self._start()
+        pieces = self._pieces()
+        for i, piece in enumerate(pieces):
+            if i and self.chunk_interval:
+                time.sleep(self.chunk_interval)
+            yield FakeChunk(piece, self._usage(contents) if i == len(pieces) - 1 else None)
+
+    async def _astream(self, contents):
+        self._count_call()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        pieces = self._pieces()
+        for i, piece in enumerate(pieces):
+            if i and self.chunk_interval:
+                await asyncio.sleep(self.chunk_interval)
+            yield FakeChunk(piece, self._usage(contents) if i == len(pieces) - 1 else None)
+
+    def generate_content(self, contents, stream=False):
+        if stream:
+            return self._stream(contents)
+        self._start()
+        return FakeResponse(self.text, self._usage(contents))
+
+    async def generate_content_async(self, contents, stream=False):
+        if stream:
+            return self._astream(contents)
+        self._count_call()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return FakeResponse(self.text, self._usage(contents))
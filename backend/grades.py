@@ -0,0 +1,136 @@
+import json
+
+from cache import LRUCache, MISSING
+
+LETTER_GRADES = ((90, "A"), (80, "B"), (70, "C"), (60, "D"))
+
+
+def letter_grade(percent):
+    if percent is None:
+        return None
+    for cutoff, letter in LETTER_GRADES:
+        if percent >= cutoff:
+            return letter
+    return "F"
+
+
+def parse_number(value):
+    # 85, "85" and "85%" all read as 85.0; raises ValueError otherwise.
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"not a number: {value!r}")
+    if isinstance(value, str):
+        value = value.strip().rstrip("%").strip()
+    return float(value)
+
+
+def _fraction(score, out_of):
+    out_of = parse_number(out_of)
+    if not out_of:
+        raise ValueError("out of zero")
+    return 100.0 * parse_number(score) / out_of
+
+
+def score_percent(marks):
+    # current_marks entries may be a percentage (85, "85" or "85%"), a
+    # fraction such as "42/50", a list of those, or a list of
+    # {"score": x, "max": y} items; lists are averaged. Anything else
+    # raises ValueError.
+    if marks is None or marks == "" or marks == []:
+        return None
+    if isinstance(marks, dict):
+        return _fraction(marks.get("score", 0), marks.get("max", marks.get("out_of", 100)) or 100)
+    if isinstance(marks, list):
+        scores = [score for score in (score_percent(item) for item in marks) if score is not None]
+        return sum(scores) / len(scores) if scores else None
+    if isinstance(marks, str) and "/" in marks:
+        return _fraction(*marks.split("/", 1))
+    return parse_number(marks)
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+class GradeEngine:
+    def __init__(self, cache_size=1024):
+        self.cache = LRUCache(maxsize=cache_size)
+
+    def compute(self, load_document, key=None, target=None, what_if=None):
+        # load_document is only called on a cache miss, so a memoized result
+        # costs no document read.
+        cache_key = None
+        if key is not None:
+            cache_key = (key, target, json.dumps(what_if, sort_keys=True) if what_if else None)
+            result = self.cache.get(cache_key)
+            if result is not MISSING:
+                return result
+
+        what_if = what_if or {}
+        courses = []
+        for semester_key, semester in load_document().items():
+            if not semester_key.startswith("semester_"):
+                continue
+            for course in semester.get("courses", []):
+                courses.append(self._course_grades(
+                    semester_key, course, target, what_if.get(course.get("course_name"), {})
+                ))
+
+        result = {"target": target, "courses": courses}
+        if cache_key is not None:
+            self.cache.set(cache_key, result)
+        return result
+
+    def _course_grades(self, semester_key, course, target, hypothetical):
+        # Values that cannot be read as numbers are skipped with a warning
+        # rather than failing the whole document.
+        warnings = []
+        weights = {}
+        for category, weight in (course.get("marks_distribution") or {}).items():
+            if not weight:
+                continue
+            try:
+                weights[category] = parse_number(weight)
+            except ValueError:
+                warnings.append(f"marks_distribution[{category!r}] is not a percentage: {weight!r}, skipped")
+        marks = dict(course.get("current_marks") or {})
+        marks.update(hypothetical)
+
+        total_weight = sum(weights.values())
+        graded_weight = 0.0
+        earned = 0.0
+        for category, weight in weights.items():
+            try:
+                score = score_percent(marks.get(category))
+            except ValueError:
+                warnings.append(f"current_marks[{category!r}] is not a score: {marks.get(category)!r}, skipped")
+                continue
+            if score is None:
+                continue
+            graded_weight += weight
+            earned += weight * score / 100.0
+
+        remaining_weight = total_weight - graded_weight
+        current = 100.0 * earned / graded_weight if graded_weight else None
+        needed = None
+        if target is not None and total_weight:
+            if remaining_weight:
+                needed = 100.0 * (target * total_weight / 100.0 - earned) / remaining_weight
+            elif current is not None:
+                needed = 0.0 if current >= target else None
+
+        result = {
+            "semester": semester_key,
+            "course_name": course.get("course_name", ""),
+            "current_grade": _round(current),
+            "letter": letter_grade(current),
+            "earned_points": _round(earned),
+            "graded_weight": _round(graded_weight),
+            "remaining_weight": _round(remaining_weight),
+            "total_weight": _round(total_weight),
+            "max_possible_grade": _round(100.0 * (earned + remaining_weight) / total_weight) if total_weight else None,
+            "needed_for_target": _round(needed),
+            "target_reachable": None if target is None else needed is not None and needed <= 100.0
+        }
+        if warnings:
+            result["warnings"] = warnings
+        return result
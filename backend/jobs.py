@@ -0,0 +1,128 @@
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self):
+        data = {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at
+        }
+        if self.status == "done":
+            data["result"] = self.result
+        elif self.status == "failed":
+            data["error"] = self.error
+        return data
+
+
+# Runs `runner(*args)` on a bounded thread pool. Jobs submitted with the key
+# of a job that is still queued or running share that job instead of
+# starting a new one. Finished jobs are kept for `retention` seconds so their
+# status can be polled, and at most `max_finished` of them, oldest dropped
+# first. Jobs live in process memory, so status polls must reach the process
+# that accepted the job.
+class JobQueue:
+    def __init__(self, runner, max_workers=4, max_pending=32, retention=3600, max_finished=10000):
+        self.runner = runner
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._in_flight = {}
+        self._finished = deque()
+        self.deduplicated = 0
+        self.rejected = 0
+
+    def submit(self, key, *args):
+        with self._lock:
+            self._prune()
+            job = self._in_flight.get(key)
+            if job is not None:
+                self.deduplicated += 1
+                return job
+            if len(self._in_flight) >= self.max_pending:
+                self.rejected += 1
+                raise JobQueueFull(f"{len(self._in_flight)} jobs already pending")
+            job = Job(key)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job
+        self._executor.submit(self._run, job, args)
+        return job
+
+    def completed(self, key, result):
+        job = Job(key)
+        job.status = "done"
+        job.result = result
+        job.finished_at = job.created_at
+        with self._lock:
+            self._jobs[job.id] = job
+            self._finish(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, args):
+        job.status = "running"
+        try:
+            job.result = self.runner(*args)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._in_flight.pop(job.key, None)
+                self._finish(job)
+
+    def _finish(self, job):
+        # Called with the lock held, in the order jobs finish.
+        self._finished.append(job)
+        self._prune()
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        while self._finished and (
+            len(self._finished) > self.max_finished or self._finished[0].finished_at < cutoff
+        ):
+            del self._jobs[self._finished.popleft().id]
+
+    def stats(self):
+        with self._lock:
+            statuses = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": len(self._in_flight),
+                "jobs": statuses,
+                "deduplicated": self.deduplicated,
+                "rejected": self.rejected
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
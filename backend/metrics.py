@@ -0,0 +1,338 @@
+import inspect
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, has_request_context, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _check(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        return tuple(str(label) for label in labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._render_sample(labels, value))
+        return lines
+
+    def _render_sample(self, labels, value):
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        labels = self._check(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount=1):
+        labels = self._check(labels)
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        labels = self._check(labels)
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, *labels):
+        labels = self._check(labels)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def _render_sample(self, labels, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            label_text = _format_labels(self.labelnames, labels, [("le", _format_value(bound))])
+            lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+        label_text = _format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+        lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "studysync_http_requests_total", "HTTP requests by route, method and status.", ("route", "method", "status")
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "studysync_http_request_duration_seconds", "Time from request to the last byte of the response.",
+    ("route", "method")
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "studysync_http_requests_in_flight", "Requests currently being handled or streamed.", ("route",)
+)
+ERRORS = REGISTRY.counter(
+    "studysync_errors_total", "Exceptions caught by route handlers, by exception type.", ("route", "exception")
+)
+CALL_LATENCY = REGISTRY.histogram(
+    "studysync_client_call_duration_seconds", "Latency of Firestore, Gemini and storage calls.",
+    ("client", "method")
+)
+CALLS_IN_FLIGHT = REGISTRY.gauge(
+    "studysync_client_calls_in_flight", "Firestore, Gemini and storage calls in progress.", ("client", "method")
+)
+CALL_ERRORS = REGISTRY.counter(
+    "studysync_client_errors_total", "Failed Firestore, Gemini and storage calls.", ("client", "method", "exception")
+)
+FIRST_CHUNK = REGISTRY.histogram(
+    "studysync_client_first_chunk_seconds", "Time to the first chunk of a streamed call.", ("client", "method")
+)
+LLM_TOKENS = REGISTRY.counter(
+    "studysync_llm_tokens_total", "Gemini tokens reported in usage metadata.", ("method", "kind")
+)
+RESPONSE_CACHE_LOOKUPS = REGISTRY.counter(
+    "studysync_response_cache_lookups_total", "Chat response cache lookups, by hit or miss.", ("result",)
+)
+
+
+def json_logs():
+    return os.getenv("LOG_FORMAT", "").lower() == "json"
+
+
+def log(event, request_id=None, **fields):
+    # One JSON object per line on stdout, tagged with the request id.
+    if request_id is None and has_request_context():
+        request_id = g.get("request_id")
+    record = {"ts": round(time.time(), 3), "event": event, "request_id": request_id}
+    record.update(fields)
+    print(json.dumps(record, default=str), flush=True)
+
+
+def current_route():
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return "-"
+
+
+def report_error(message, error, route=None, request_id=None):
+    ERRORS.inc(route or current_route(), type(error).__name__)
+    # Formatted from the error itself so it also works outside an except block.
+    trace = "".join(traceback.format_exception(error))
+    if json_logs():
+        log("error", request_id, message=message, error=str(error), exception=type(error).__name__,
+            traceback=trace)
+    else:
+        print(f"{message}: {str(error)}")
+        print(trace)
+
+
+class RequestTimer:
+    def __init__(self, route, method, request_id=None):
+        self.route = route
+        self.method = method
+        self.request_id = request_id or uuid.uuid4().hex
+        self.status = 500
+        self.started = time.perf_counter()
+        HTTP_IN_FLIGHT.inc(route)
+
+    def finish(self):
+        duration = time.perf_counter() - self.started
+        HTTP_IN_FLIGHT.dec(self.route)
+        HTTP_LATENCY.observe(duration, self.route, self.method)
+        HTTP_REQUESTS.inc(self.route, self.method, self.status)
+        if json_logs():
+            log("request", self.request_id, route=self.route, method=self.method, status=self.status,
+                duration_ms=round(duration * 1000, 1))
+
+
+def instrument_app(app):
+    # Times every request from the first hook to teardown. Streamed
+    # responses keep their request context open until the stream ends, so
+    # their latency includes the whole stream.
+    @app.before_request
+    def start_request_timer():
+        g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        g.request_timer = RequestTimer(current_route(), request.method, g.request_id)
+
+    @app.after_request
+    def record_status(response):
+        if "request_timer" in g:
+            g.request_timer.status = response.status_code
+            response.headers["X-Request-ID"] = g.request_id
+        return response
+
+    @app.teardown_request
+    def finish_request_timer(error=None):
+        timer = g.pop("request_timer", None)
+        if timer is not None:
+            timer.finish()
+
+
+def _finish_call(client, method, started, error=None):
+    CALLS_IN_FLIGHT.dec(client, method)
+    CALL_LATENCY.observe(time.perf_counter() - started, client, method)
+    if error is not None:
+        CALL_ERRORS.inc(client, method, type(error).__name__)
+
+
+def _timed_stream(client, method, started, chunks):
+    # In flight from the first next(): a generator that is never iterated
+    # never reaches the finally block that would take it out again.
+    CALLS_IN_FLIGHT.inc(client, method)
+    error = None
+    first = True
+    try:
+        for chunk in chunks:
+            if first:
+                FIRST_CHUNK.observe(time.perf_counter() - started, client, method)
+                first = False
+            yield chunk
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        chunks.close()
+        _finish_call(client, method, started, error)
+
+
+async def _timed_async_stream(client, method, started, chunks):
+    CALLS_IN_FLIGHT.inc(client, method)
+    error = None
+    first = True
+    try:
+        async for chunk in chunks:
+            if first:
+                FIRST_CHUNK.observe(time.perf_counter() - started, client, method)
+                first = False
+            yield chunk
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        await chunks.aclose()
+        _finish_call(client, method, started, error)
+
+
+def timed(client, method, fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        CALLS_IN_FLIGHT.inc(client, method)
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            _finish_call(client, method, started, e)
+            raise
+        if inspect.isgenerator(result):
+            CALLS_IN_FLIGHT.dec(client, method)
+            return _timed_stream(client, method, started, result)
+        if inspect.isasyncgen(result):
+            CALLS_IN_FLIGHT.dec(client, method)
+            return _timed_async_stream(client, method, started, result)
+        _finish_call(client, method, started)
+        return result
+
+    return wrapper
+
+
+def instrumented(client):
+    # Class decorator: times every public method under the given client
+    # label. Generators are timed until they are exhausted or closed, and
+    # count as in flight only once iterated.
+    def decorate(cls):
+        for name, attribute in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.isfunction(attribute):
+                continue
+            setattr(cls, name, timed(client, name, attribute))
+        return cls
+
+    return decorate
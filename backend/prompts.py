@@ -1,3 +1,9 @@
+import hashlib
+from functools import lru_cache
+from string import Template
+
+from events import DEADLINE_TYPES
+
 BASE_SYSTEM_PROMPT = """
 You are an AI assistant for students. Your goal is to help students organize their academic life and succeed in their studies.
 Be concise, helpful, and encouraging. Focus on providing actionable advice and clear organization.
@@ -48,6 +54,29 @@ When providing study tips:
 - Offer memory techniques appropriate for the subject matter
 """
 
+SYLLABUS_ANALYSIS_PROMPT = """For context: Class hours is the start_time and end_time of classes. Analyze the syllabus PDF and return structured data in this exact JSON format:
+                {
+                  "course_name": string,
+                  "instructor_name": string,
+                  "start_time": "HH:MM XM",
+                  "end_time": "HH:MM XM",
+                  "schedule": [{
+                    "date": "YYYY-MM-DD",
+                    "type": "class|assignment|quiz|exam|project|other",
+                    "title": string,
+                    "description": string
+                  }],
+                  "marks_distribution": {
+                    "assignment": percentage,
+                    "quiz": percentage,
+                    "exam": percentage,
+                    "project": percentage
+                  }
+                }
+                Your response must be valid JSON only, with no additional text, markdown formatting, or code blocks."""
+
+SYLLABUS_PROMPT_VERSION = hashlib.sha256(SYLLABUS_ANALYSIS_PROMPT.encode()).hexdigest()[:16]
+
 def get_prompt_for_task(task):
     prompts = {
         "schedule": SCHEDULE_PROMPT,
@@ -57,4 +86,141 @@ def get_prompt_for_task(task):
         "study_tips": STUDY_TIPS_PROMPT
     }
     
-    return prompts.get(task.lower(), BASE_SYSTEM_PROMPT)
\ No newline at end of file
+    return prompts.get((task or "").lower(), BASE_SYSTEM_PROMPT)
+
+CONVERSATION_SUMMARY_PROMPT = """Summarize this conversation between a student and their study assistant in at most 150 words.
+Keep facts, decisions, dates and open questions that later turns may refer to. Reply with the summary only.
+
+Summary so far:
+{summary}
+
+New turns:
+{transcript}"""
+
+PROMPT_TEMPLATE = """$system
+
+Student context (today is $today):
+$context
+
+Student request:
+$prompt"""
+
+PROMPT_TEMPLATE_NO_CONTEXT = """$system
+
+Student request:
+$prompt"""
+
+# Context sections sent with each task type, most relevant first. Sections
+# are cut off once the token budget is spent.
+TASK_CONTEXT_SECTIONS = {
+    "schedule": ("courses", "upcoming_events"),
+    "grades": ("grades", "courses"),
+    "exams": ("upcoming_exams", "courses"),
+    "todo": ("upcoming_deadlines",),
+    "study_tips": ("courses", "upcoming_exams"),
+    "general": ("courses", "upcoming_deadlines"),
+}
+
+EXAM_TYPES = ("exam", "quiz")
+MAX_CONTEXT_EVENTS = 50
+MAX_DESCRIPTION_CHARS = 80
+
+
+def estimate_tokens(text):
+    return (len(text) + 3) // 4
+
+
+@lru_cache(maxsize=None)
+def get_prompt_template(task, with_context=True):
+    system = get_prompt_for_task(task).strip().replace("$", "$$")
+    template = PROMPT_TEMPLATE if with_context else PROMPT_TEMPLATE_NO_CONTEXT
+    return Template(Template(template).safe_substitute(system=system))
+
+
+def sections_for_task(task):
+    return TASK_CONTEXT_SECTIONS.get((task or "").lower(), TASK_CONTEXT_SECTIONS["general"])
+
+
+def _format_event(event):
+    line = f"- {event.get('date', '')} {event.get('type', '')}, {event.get('course_name', '')}: {event.get('title', '')}"
+    description = event.get("description", "")
+    if description and description != event.get("title"):
+        line += f" ({description[:MAX_DESCRIPTION_CHARS]})"
+    return line
+
+
+def _course_lines(document):
+    yield "Courses:"
+    for key, semester in document.items():
+        if not key.startswith("semester_"):
+            continue
+        for course in semester.get("courses", []):
+            line = f"- {course.get('course_name', '')}"
+            if course.get("instructor_name"):
+                line += f" ({course['instructor_name']})"
+            if course.get("start_time"):
+                line += f", {course['start_time']}-{course.get('end_time', '')}"
+            weights = ", ".join(f"{k} {v}%" for k, v in (course.get("marks_distribution") or {}).items() if v)
+            if weights:
+                line += f", weights: {weights}"
+            yield line
+
+
+def _grade_lines(grades):
+    yield "Grades:"
+    for course in grades.get("courses", []):
+        if course["current_grade"] is None:
+            yield f"- {course['course_name']}: no marks recorded yet"
+        else:
+            yield (
+                f"- {course['course_name']}: {course['current_grade']}% ({course['letter']}) over "
+                f"{course['graded_weight']} of {course['total_weight']} weight, max possible {course['max_possible_grade']}%"
+            )
+
+
+def _event_lines(title, events):
+    yield title
+    for event in events:
+        yield _format_event(event)
+
+
+# Builds the model input for a chat turn from the task's system prompt and
+# a slice of the student's data picked for that task, trimmed to
+# `context_tokens` (estimated at four characters per token).
+class PromptBuilder:
+    def __init__(self, context_tokens=1200):
+        self.context_tokens = context_tokens
+
+    def build(self, task, prompt, today, document=None, events=None, grades=None, summary=None):
+        sections = [f"Conversation so far (summary):\n{summary}"] if summary else []
+        budget = self.context_tokens
+        for section in sections_for_task(task):
+            lines = []
+            for line in self._section_lines(section, today, document, events, grades):
+                cost = estimate_tokens(line) + 1
+                if cost > budget:
+                    break
+                lines.append(line)
+                budget -= cost
+            if len(lines) > 1:
+                sections.append("\n".join(lines))
+
+        context = "\n".join(sections)
+        if not context:
+            return get_prompt_template(task, with_context=False).substitute(prompt=prompt), None
+        text = get_prompt_template(task).substitute(today=today, context=context, prompt=prompt)
+        return text, hashlib.sha256(context.encode()).hexdigest()
+
+    def _section_lines(self, section, today, document, events, grades):
+        if section == "courses" and document:
+            return _course_lines(document)
+        if section == "grades" and grades:
+            return _grade_lines(grades)
+        if events is not None:
+            if section == "upcoming_events":
+                return _event_lines("Upcoming events:", events.range(start=today)[:MAX_CONTEXT_EVENTS])
+            if section == "upcoming_exams":
+                return _event_lines("Upcoming exams and quizzes:", events.upcoming(today, MAX_CONTEXT_EVENTS, EXAM_TYPES))
+            if section == "upcoming_deadlines":
+                return _event_lines("Upcoming deadlines:", events.upcoming(today, MAX_CONTEXT_EVENTS, DEADLINE_TYPES))
+        return ()
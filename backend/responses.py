@@ -0,0 +1,145 @@
+import fnmatch
+import gzip
+import hashlib
+import json
+
+from flask import Response
+
+from cache import LRUCache, MISSING
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_BYTES = 1024
+ENCODING_SUFFIXES = {"br": "-br", "gzip": "-gz"}
+
+
+def parse_fields(value):
+    # "semester_1,-schedule" -> (("semester_1",), ("schedule",)). Plain names
+    # (glob patterns allowed) pick top-level keys; names prefixed with "-"
+    # drop those keys from every course.
+    if not value:
+        return None
+    tokens = sorted({token.strip() for token in value.split(",") if token.strip()})
+    include = tuple(token for token in tokens if not token.startswith("-"))
+    exclude = tuple(token[1:] for token in tokens if token.startswith("-") and len(token) > 1)
+    return (include, exclude) if include or exclude else None
+
+
+def project(document, fields):
+    if fields is None:
+        return document
+    include, exclude = fields
+    projected = {}
+    for key, value in document.items():
+        if include and not any(fnmatch.fnmatchcase(key, pattern) for pattern in include):
+            continue
+        if exclude and key.startswith("semester_") and isinstance(value, dict):
+            value = {
+                **value,
+                "courses": [
+                    {name: item for name, item in course.items() if name not in exclude}
+                    for course in value.get("courses", [])
+                ]
+            }
+        projected[key] = value
+    return projected
+
+
+def negotiate_encoding(accept_encoding):
+    offered = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            offered[name.strip().lower()] = quality
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if offered.get(encoding, offered.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+
+def _compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def _matching_etag(if_none_match, base):
+    # Weak comparison, ignoring the content-coding suffix, as If-None-Match
+    # allows. Returns the client's tag so a 304 repeats what it has cached.
+    if not if_none_match:
+        return None
+    for raw in if_none_match.split(","):
+        raw = raw.strip()
+        if raw == "*":
+            return f'"{base}"'
+        tag = (raw[2:] if raw.startswith("W/") else raw).strip('"')
+        for suffix in ENCODING_SUFFIXES.values():
+            if tag.endswith(suffix):
+                tag = tag[:-len(suffix)]
+                break
+        if tag == base:
+            return raw
+    return None
+
+
+# Serialized (and compressed) JSON documents keyed on (key, version,
+# projection, encoding), served with a strong ETag derived from the same
+# key. A request whose If-None-Match still matches gets a bodiless 304
+# without the document being loaded at all.
+class RepresentationCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, maxsize=4096):
+        self.cache = LRUCache(maxsize=maxsize, max_bytes=max_bytes, sizeof=len)
+        self.not_modified = 0
+
+    @staticmethod
+    def etag(key, version, fields):
+        return hashlib.sha1(json.dumps([key, version, fields]).encode()).hexdigest()[:24]
+
+    def body(self, key, version, fields, encoding, load_document):
+        cache_key = (key, version, fields, encoding)
+        body = self.cache.get(cache_key)
+        if body is not MISSING:
+            return body
+        if encoding == "identity":
+            body = json.dumps(project(load_document(), fields), separators=(",", ":")).encode()
+        else:
+            body = _compress(self.body(key, version, fields, "identity", load_document), encoding)
+        self.cache.set(cache_key, body)
+        return body
+
+    def response(self, request, key, version, load_document):
+        fields = parse_fields(request.args.get('fields'))
+        base = self.etag(key, version, fields)
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+        matched = _matching_etag(request.headers.get('If-None-Match'), base)
+        if matched is not None:
+            self.not_modified += 1
+            headers["ETag"] = matched
+            return Response(status=304, headers=headers)
+
+        body = self.body(key, version, fields, "identity", load_document)
+        if encoding != "identity" and len(body) >= MIN_COMPRESS_BYTES:
+            body = self.body(key, version, fields, encoding, load_document)
+            headers["Content-Encoding"] = encoding
+        else:
+            encoding = "identity"
+        headers["ETag"] = f'"{base}{ENCODING_SUFFIXES.get(encoding, "")}"'
+        return Response(body, mimetype='application/json', headers=headers)
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats["not_modified"] = self.not_modified
+        return stats
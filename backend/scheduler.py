@@ -0,0 +1,216 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+
+SLOT_POLL_INTERVAL = 0.01
+
+
+@lru_cache(maxsize=None)
+def retryable_errors():
+    # Imported on first use: google.api_core takes ~100 ms to import.
+    from google.api_core import exceptions as google_exceptions
+
+    return (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+    )
+
+
+# Caps in-flight model calls with a semaphore and their start rate with a
+# token bucket, retries retryable errors with full-jitter exponential
+# backoff, and lets concurrent calls that share a key wait on a single
+# upstream request.
+class RequestScheduler:
+    def __init__(self, max_concurrency=8, rate=None, burst=None, max_retries=3, base_delay=0.5,
+                 max_delay=8.0, retryable=None, clock=time.monotonic, sleep=time.sleep):
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = burst or max(1, int(rate or 1))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._retryable = retryable
+        self.clock = clock
+        self.sleep = sleep
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._bucket_lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._last_refill = clock()
+        self._flight_lock = threading.Lock()
+        self._in_flight = {}
+        self.active = 0
+        self.calls = 0
+        self.retries = 0
+        self.coalesced = 0
+        self.throttled = 0
+
+    @property
+    def retryable(self):
+        if self._retryable is None:
+            self._retryable = retryable_errors()
+        return self._retryable
+
+    def _take_token(self):
+        # Returns 0 once a token is taken, else how long to wait for one.
+        if not self.rate:
+            return 0
+        with self._bucket_lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            self.throttled += 1
+            return (1 - self._tokens) / self.rate
+
+    def _acquire_token(self):
+        wait = self._take_token()
+        while wait:
+            self.sleep(wait)
+            wait = self._take_token()
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _attempt(self, fn, args, kwargs):
+        self._acquire_token()
+        with self._slots:
+            self.active += 1
+            self.calls += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.active -= 1
+
+    def _call_with_retries(self, fn, args, kwargs):
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(fn, args, kwargs)
+            except self.retryable:
+                if attempt >= self.max_retries:
+                    raise
+                self.retries += 1
+                self.sleep(self._backoff(attempt))
+                attempt += 1
+
+    def call(self, fn, *args, key=None, **kwargs):
+        if key is None:
+            return self._call_with_retries(fn, args, kwargs)
+
+        with self._flight_lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = self._call_with_retries(fn, args, kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._flight_lock:
+                self._in_flight.pop(key, None)
+
+    def stream(self, fn, *args, **kwargs):
+        # Holds a slot for the life of the stream. Errors are only retried
+        # before the first chunk, since later ones would duplicate output.
+        attempt = 0
+        while True:
+            self._acquire_token()
+            self._slots.acquire()
+            self.active += 1
+            self.calls += 1
+            try:
+                chunks = iter(fn(*args, **kwargs))
+                first = next(chunks, None)
+                break
+            except self.retryable:
+                self.active -= 1
+                self._slots.release()
+                if attempt >= self.max_retries:
+                    raise
+                self.retries += 1
+                self.sleep(self._backoff(attempt))
+                attempt += 1
+            except BaseException:
+                self.active -= 1
+                self._slots.release()
+                raise
+
+        try:
+            if first is not None:
+                yield first
+            yield from chunks
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    async def astream(self, fn, *args, **kwargs):
+        # stream() for coroutine functions returning an async iterator. The
+        # same slots are shared with the sync paths, but waiting for one
+        # yields to the event loop instead of blocking it.
+        attempt = 0
+        while True:
+            wait = self._take_token()
+            while wait:
+                await asyncio.sleep(wait)
+                wait = self._take_token()
+            while not self._slots.acquire(blocking=False):
+                await asyncio.sleep(SLOT_POLL_INTERVAL)
+            self.active += 1
+            self.calls += 1
+            try:
+                chunks = aiter(await fn(*args, **kwargs))
+                first = await anext(chunks, None)
+                break
+            except self.retryable:
+                self.active -= 1
+                self._slots.release()
+                if attempt >= self.max_retries:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+            except BaseException:
+                self.active -= 1
+                self._slots.release()
+                raise
+        
+        try:
+            if first is not None:
+                yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            self.active -= 1
+            self._slots.release()
+            close = getattr(chunks, "aclose", None)
+            if close is not None:
+                await close()
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "rate": self.rate,
+            "active": self.active,
+            "calls": self.calls,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "throttled": self.throttled
+        }
@@ -0,0 +1,157 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import LRUCache, MISSING
+from metrics import report_error
+from prompts import estimate_tokens
+from storage import SQLiteStore
+
+SUMMARY_MAX_CHARS = 2000
+EXTRACT_TURN_CHARS = 200
+
+SESSION_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sessions_by_update ON sessions (updated_at);
+"""
+
+
+def extractive_summary(summary, turns):
+    lines = [summary] if summary else []
+    for role, text in turns:
+        speaker = "Student" if role == "user" else "Assistant"
+        lines.append(f"{speaker}: {' '.join(text.split())[:EXTRACT_TURN_CHARS]}")
+    return "\n".join(lines)[-SUMMARY_MAX_CHARS:]
+
+
+class Session:
+    def __init__(self, session_id, turns=None, summary=""):
+        self.id = session_id
+        self.turns = turns or []
+        self.summary = summary
+        self.lock = threading.Lock()
+        self.compacting = False
+
+    def tokens(self):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(text) for _, text in self.turns)
+
+    def history(self):
+        with self.lock:
+            return self.summary, list(self.turns)
+
+    def to_json(self):
+        return json.dumps({"summary": self.summary, "turns": self.turns})
+
+    @classmethod
+    def from_json(cls, session_id, data):
+        data = json.loads(data)
+        return cls(session_id, [tuple(turn) for turn in data["turns"]], data["summary"])
+
+
+class SessionBacking(SQLiteStore):
+    schema = SESSION_STORE_SCHEMA
+
+    def load(self, session_id, newer_than):
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE id = ? AND updated_at > ?", (session_id, newer_than)
+        ).fetchone()
+        return Session.from_json(session_id, row[0]) if row else None
+
+    def save(self, session):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, updated_at) VALUES (?, ?, ?)",
+                (session.id, session.to_json(), time.time()),
+            )
+
+    def prune(self, older_than):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM sessions WHERE updated_at <= ?", (older_than,))
+
+
+# Conversation turns per session id, held in an LRU with an idle TTL and
+# optionally persisted to SQLite. Once a session's history passes
+# `compact_tokens`, every turn but the last `keep_turns` is folded into a
+# running summary in the background, so the history sent with each turn
+# stays roughly constant in size.
+class SessionStore:
+    def __init__(self, summarize=None, max_sessions=10000, idle_ttl=3600, compact_tokens=2000,
+                 keep_turns=4, backing=None):
+        self.summarize = summarize or extractive_summary
+        self.idle_ttl = idle_ttl
+        self.compact_tokens = compact_tokens
+        self.keep_turns = keep_turns
+        self.backing = backing
+        self._sessions = LRUCache(maxsize=max_sessions, ttl=idle_ttl)
+        self._create_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-compact")
+        self._appends = 0
+        self.compactions = 0
+
+    def get(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is not MISSING:
+            return session
+        with self._create_lock:
+            session = self._sessions.get(session_id)
+            if session is MISSING:
+                session = None
+                if self.backing is not None:
+                    session = self.backing.load(session_id, time.time() - self.idle_ttl)
+                session = session or Session(session_id)
+                self._sessions.set(session_id, session)
+            return session
+
+    def append(self, session_id, user_text, model_text):
+        session = self.get(session_id)
+        with session.lock:
+            session.turns.append(("user", user_text))
+            session.turns.append(("model", model_text))
+            compact = (
+                not session.compacting
+                and len(session.turns) > self.keep_turns
+                and session.tokens() > self.compact_tokens
+            )
+            if compact:
+                session.compacting = True
+        self._sessions.set(session_id, session)
+        self._persist(session)
+        if compact:
+            self._executor.submit(self._compact, session)
+
+    def _persist(self, session):
+        if self.backing is None:
+            return
+        with session.lock:
+            self.backing.save(session)
+        self._appends += 1
+        if self._appends % 100 == 0:
+            self.backing.prune(time.time() - self.idle_ttl)
+
+    def _compact(self, session):
+        try:
+            with session.lock:
+                summary = session.summary
+                older = session.turns[:-self.keep_turns]
+            try:
+                new_summary = self.summarize(summary, older)
+            except Exception as e:
+                report_error(f"Error summarizing session {session.id}", e, route="sessions")
+                new_summary = extractive_summary(summary, older)
+            with session.lock:
+                session.turns = session.turns[len(older):]
+                session.summary = new_summary[-SUMMARY_MAX_CHARS:]
+            self.compactions += 1
+            self._persist(session)
+        finally:
+            session.compacting = False
+
+    def stats(self):
+        stats = self._sessions.stats()
+        stats["compactions"] = self.compactions
+        return stats
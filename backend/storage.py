@@ -0,0 +1,395 @@
+import fcntl
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from metrics import instrumented
+
+
+def _is_error(result):
+    return isinstance(result, dict) and "error" in result
+
+
+class _PendingUpdate:
+    def __init__(self, mutator):
+        self.mutator = mutator
+        self.result = None
+        self.error = None
+        self.done = False
+
+
+# Reads are served from a pre-serialized buffer keyed on the file's
+# (mtime, size, inode), so writes from other workers are picked up.
+# Concurrent update() calls are queued; whoever takes the write lock
+# applies every pending mutator and commits them in one atomic rename.
+# A mutator that raises or returns an {"error": ...} dict is rolled back,
+# and a batch left with nothing to apply leaves the file untouched.
+@instrumented("student_data_file")
+class StudentDataStore:
+    def __init__(self, path="student_data.json"):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self._read_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending = []
+        self._data = None
+        self._body = None
+        self._stat = None
+
+    @staticmethod
+    def _stat_key(st):
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _refresh(self):
+        with self._read_lock:
+            if self._stat is not None and self._stat_key(os.stat(self.path)) == self._stat:
+                return
+            with open(self.path, 'rb') as f:
+                stat = self._stat_key(os.fstat(f.fileno()))
+                raw = f.read()
+            data = json.loads(raw)
+            self._data = data
+            self._body = json.dumps(data, separators=(",", ":")).encode()
+            self._stat = stat
+
+    def load(self):
+        self._refresh()
+        return self._data
+
+    def read_bytes(self):
+        self._refresh()
+        return self._body
+
+    @property
+    def version(self):
+        self._refresh()
+        return "%x-%x-%x" % self._stat
+
+    @contextmanager
+    def _file_lock(self):
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _commit(self, data):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.student_data.', suffix='.tmp')
+        try:
+            # mkstemp creates the file 0600; keep the mode of the file it replaces.
+            try:
+                os.fchmod(fd, os.stat(self.path).st_mode & 0o7777)
+            except FileNotFoundError:
+                os.fchmod(fd, 0o644)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        with self._read_lock:
+            self._data = data
+            self._body = json.dumps(data, separators=(",", ":")).encode()
+            self._stat = self._stat_key(os.stat(self.path))
+
+    def update(self, mutator):
+        pending = _PendingUpdate(mutator)
+        with self._pending_lock:
+            self._pending.append(pending)
+
+        with self._write_lock:
+            if not pending.done:
+                with self._pending_lock:
+                    batch, self._pending = self._pending, []
+                self._apply(batch)
+
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _apply(self, batch):
+        try:
+            with self._file_lock():
+                self._refresh()
+                working = json.loads(self._body)
+                applied = []
+                for pending in batch:
+                    try:
+                        pending.result = pending.mutator(working)
+                    except Exception as e:
+                        pending.error = e
+                    if pending.error is None and not _is_error(pending.result):
+                        applied.append(pending)
+                        continue
+                    working = json.loads(self._body)
+                    for previous in applied:
+                        previous.mutator(working)
+                if applied:
+                    self._commit(working)
+        except Exception as e:
+            for pending in batch:
+                if pending.error is None:
+                    pending.error = e
+        finally:
+            for pending in batch:
+                pending.done = True
+
+    def replace(self, data):
+        # Writes a whole document, creating the file if it does not exist.
+        with self._write_lock:
+            with self._file_lock():
+                self._commit(data)
+
+
+USER_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS semesters (
+    email TEXT NOT NULL,
+    semester_key TEXT NOT NULL,
+    term TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (email, semester_key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS courses (
+    email TEXT NOT NULL,
+    semester_key TEXT NOT NULL,
+    course_name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (email, semester_key, course_name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sync_state (
+    email TEXT PRIMARY KEY,
+    update_time TEXT NOT NULL,
+    digests TEXT NOT NULL
+);
+"""
+
+
+class SQLiteStore:
+    schema = ""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(self.schema)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+# One row per course, schedule included, keyed by email, so course upserts
+# touch only the rows involved instead of rewriting a whole document.
+# Date and type queries are served by the in-memory EventIndex. Each user
+# carries a version counter that is bumped on every write. sync_state
+# records the Firestore update time and per-course digests of the last
+# synced document; local edits drop it, so the next sync replaces the
+# user's rows wholesale.
+@instrumented("student_db")
+class UserDataStore(SQLiteStore):
+    schema = USER_STORE_SCHEMA
+
+    def __init__(self, path="student_data.db"):
+        super().__init__(path)
+
+    def _touch_user(self, conn, email, name=None):
+        conn.execute(
+            "INSERT INTO users (email, name, version) VALUES (?, COALESCE(?, ''), 1) "
+            "ON CONFLICT (email) DO UPDATE SET name = COALESCE(?, name), version = version + 1",
+            (email, name, name),
+        )
+        return conn.execute("SELECT version FROM users WHERE email = ?", (email,)).fetchone()[0]
+
+    def _write_course(self, conn, email, semester_key, course, position):
+        conn.execute(
+            "INSERT OR REPLACE INTO courses (email, semester_key, course_name, position, data) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (email, semester_key, course.get("course_name", ""), position, json.dumps(course)),
+        )
+
+    def _forget_sync(self, conn, email):
+        conn.execute("DELETE FROM sync_state WHERE email = ?", (email,))
+
+    def _save_sync(self, conn, email, update_time, digests):
+        conn.execute(
+            "INSERT OR REPLACE INTO sync_state (email, update_time, digests) VALUES (?, ?, ?)",
+            (email, update_time, json.dumps(digests)),
+        )
+
+    def sync_state(self, email):
+        row = self._connection().execute(
+            "SELECT update_time, digests FROM sync_state WHERE email = ?", (email,)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else (None, None)
+
+    def version(self, email):
+        row = self._connection().execute("SELECT version FROM users WHERE email = ?", (email,)).fetchone()
+        return row[0] if row else None
+
+    def get_user(self, email):
+        conn = self._connection()
+        user = conn.execute("SELECT name FROM users WHERE email = ?", (email,)).fetchone()
+        if user is None:
+            return None
+
+        result = {"email": email, "name": user[0]}
+        for semester_key, term in conn.execute(
+            "SELECT semester_key, term FROM semesters WHERE email = ? ORDER BY semester_key", (email,)
+        ):
+            result[semester_key] = {"term": term, "courses": []}
+
+        for semester_key, data in conn.execute(
+            "SELECT semester_key, data FROM courses WHERE email = ? ORDER BY semester_key, position",
+            (email,),
+        ):
+            course = json.loads(data)
+            course.setdefault("schedule", [])
+            result.setdefault(semester_key, {"term": "", "courses": []})["courses"].append(course)
+
+        return result
+
+    def put_user(self, document, update_time=None, digests=None):
+        email = document["email"]
+        with self._transaction() as conn:
+            for table in ("semesters", "courses"):
+                conn.execute(f"DELETE FROM {table} WHERE email = ?", (email,))
+            if update_time is None:
+                self._forget_sync(conn, email)
+            else:
+                self._save_sync(conn, email, update_time, digests)
+            self._touch_user(conn, email, document.get("name", ""))
+            for key, semester in document.items():
+                if not key.startswith("semester_"):
+                    continue
+                conn.execute(
+                    "INSERT INTO semesters (email, semester_key, term) VALUES (?, ?, ?)",
+                    (email, key, semester.get("term", "")),
+                )
+                for position, course in enumerate(semester.get("courses", [])):
+                    self._write_course(conn, email, key, course, position)
+
+    def apply_sync(self, email, base_update_time, update_time, digests, changes):
+        # Applies a diff computed against the sync state stamped
+        # base_update_time. Returns False, writing nothing, if another
+        # writer moved the state on in the meantime.
+        with self._transaction() as conn:
+            row = conn.execute("SELECT update_time FROM sync_state WHERE email = ?", (email,)).fetchone()
+            if row is None or row[0] != base_update_time:
+                return False
+            self._save_sync(conn, email, update_time, digests)
+            if changes["name"] is None and not any(value for key, value in changes.items() if key != "name"):
+                return True
+
+            for semester_key in changes["removed_semesters"]:
+                for table in ("semesters", "courses"):
+                    conn.execute(
+                        f"DELETE FROM {table} WHERE email = ? AND semester_key = ?", (email, semester_key)
+                    )
+            for semester_key, term in changes["semesters"]:
+                conn.execute(
+                    "INSERT INTO semesters (email, semester_key, term) VALUES (?, ?, ?) "
+                    "ON CONFLICT (email, semester_key) DO UPDATE SET term = excluded.term",
+                    (email, semester_key, term),
+                )
+            for semester_key, course_name in changes["removed_courses"]:
+                conn.execute(
+                    "DELETE FROM courses WHERE email = ? AND semester_key = ? AND course_name = ?",
+                    (email, semester_key, course_name),
+                )
+            conn.executemany(
+                "UPDATE courses SET position = ? WHERE email = ? AND semester_key = ? AND course_name = ?",
+                [(position, email, semester_key, course_name)
+                 for semester_key, course_name, position in changes["positions"]],
+            )
+            for semester_key, position, course in changes["courses"]:
+                self._write_course(conn, email, semester_key, course, position)
+            self._touch_user(conn, email, changes["name"])
+            return True
+
+    def upsert_semester(self, email, semester_key, term):
+        # Like add_semester in Firestore, an existing semester is emptied.
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO semesters (email, semester_key, term) VALUES (?, ?, ?) "
+                "ON CONFLICT (email, semester_key) DO UPDATE SET term = excluded.term",
+                (email, semester_key, term),
+            )
+            conn.execute("DELETE FROM courses WHERE email = ? AND semester_key = ?", (email, semester_key))
+            self._forget_sync(conn, email)
+            return self._touch_user(conn, email)
+
+    def upsert_courses(self, email, courses, semester_key=None):
+        # Upserts by course name in one transaction; new courses go after
+        # the semester's existing ones, in the order given.
+        with self._transaction() as conn:
+            if semester_key is None:
+                row = conn.execute(
+                    "SELECT semester_key FROM semesters WHERE email = ? ORDER BY semester_key LIMIT 1", (email,)
+                ).fetchone()
+            else:
+                row = conn.execute(
+                    "SELECT semester_key FROM semesters WHERE email = ? AND semester_key = ?", (email, semester_key)
+                ).fetchone()
+            if row is None:
+                return None
+            semester_key = row[0]
+
+            next_position = conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM courses WHERE email = ? AND semester_key = ?",
+                (email, semester_key),
+            ).fetchone()[0]
+            for course in courses:
+                existing = conn.execute(
+                    "SELECT position FROM courses WHERE email = ? AND semester_key = ? AND course_name = ?",
+                    (email, semester_key, course.get("course_name", "")),
+                ).fetchone()
+                if existing is not None:
+                    position = existing[0]
+                else:
+                    position = next_position
+                    next_position += 1
+                self._write_course(conn, email, semester_key, course, position)
+            self._forget_sync(conn, email)
+            return semester_key, self._touch_user(conn, email)
+
+    def set_semester_courses(self, email, semester_key, courses):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO semesters (email, semester_key) VALUES (?, ?) ON CONFLICT (email, semester_key) DO NOTHING",
+                (email, semester_key),
+            )
+            conn.execute("DELETE FROM courses WHERE email = ? AND semester_key = ?", (email, semester_key))
+            for position, course in enumerate(courses):
+                self._write_course(conn, email, semester_key, course, position)
+            self._forget_sync(conn, email)
+            return self._touch_user(conn, email)
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def chunk_event(text):
+    return "chunk", {"chunk": text}
+
+
+def _complete_event(count, started, first_chunk_at, finished, complete_fields):
+    return sse_event("complete", {
+        "status": "complete",
+        "chunks": count,
+        "ttft_ms": round((first_chunk_at - started) * 1000, 1) if first_chunk_at is not None else None,
+        "duration_ms": round((finished - started) * 1000, 1),
+        **(complete_fields or {})
+    })
+
+
+def _put(items, item, cancelled):
+    while not cancelled.is_set():
+        try:
+            items.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+# Turns an iterator of text chunks into Server-Sent Events. A `start` event
+# goes out immediately, a comment heartbeat whenever the upstream is silent
+# for `heartbeat_interval` seconds, and a `complete` event with timing at
+# the end. The upstream is drained on a helper thread; when the client goes
+# away and this generator is closed, the helper stops and closes the
+# upstream iterator after its current chunk. `as_event` maps each upstream
+# item to an (event, data) pair; by default items are text chunks.
+def sse_stream(chunks, heartbeat_interval=15.0, complete_fields=None, clock=time.monotonic, as_event=chunk_event):
+    started = clock()
+    items = queue.Queue(maxsize=64)
+    cancelled = threading.Event()
+
+    def pump():
+        try:
+            for text in chunks:
+                if not _put(items, ("chunk", text), cancelled):
+                    return
+            _put(items, ("done", None), cancelled)
+        except Exception as e:
+            _put(items, ("error", str(e)), cancelled)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    threading.Thread(target=pump, name="sse-pump", daemon=True).start()
+
+    try:
+        yield sse_event("start", {"status": "started"})
+        first_chunk_at = None
+        count = 0
+        while True:
+            try:
+                kind, payload = items.get(timeout=heartbeat_interval)
+            except queue.Empty:
+                yield ": heartbeat\n\n"
+                continue
+            if kind == "chunk":
+                if first_chunk_at is None:
+                    first_chunk_at = clock()
+                count += 1
+                yield sse_event(*as_event(payload))
+            elif kind == "error":
+                yield sse_event("error", {"error": payload})
+                return
+            else:
+                break
+
+        yield _complete_event(count, started, first_chunk_at, clock(), complete_fields)
+    finally:
+        cancelled.set()
+
+
+# sse_stream() for an async iterator of text chunks. No helper thread is
+# needed: the pending read is simply raced against the heartbeat timer, and
+# closing this generator cancels it and closes the upstream.
+async def async_sse_stream(chunks, heartbeat_interval=15.0, complete_fields=None, clock=time.monotonic,
+                           as_event=chunk_event):
+    started = clock()
+    chunks = aiter(chunks)
+    pending = None
+    try:
+        yield sse_event("start", {"status": "started"})
+        first_chunk_at = None
+        count = 0
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(anext(chunks))
+            done, _ = await asyncio.wait({pending}, timeout=heartbeat_interval)
+            if not done:
+                yield ": heartbeat\n\n"
+                continue
+            read, pending = pending, None
+            try:
+                text = read.result()
+            except StopAsyncIteration:
+                break
+            except Exception as e:
+                yield sse_event("error", {"error": str(e)})
+                return
+            if first_chunk_at is None:
+                first_chunk_at = clock()
+            count += 1
+            yield sse_event(*as_event(text))
+
+        yield _complete_event(count, started, first_chunk_at, clock(), complete_fields)
+    finally:
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except BaseException:
+                pass
+        close = getattr(chunks, "aclose", None)
+        if close is not None:
+            await close()
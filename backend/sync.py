@@ -0,0 +1,253 @@
+import datetime
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from metrics import report_error
+
+LOCK_STRIPES = 64
+
+
+def sync_mark(update_time):
+    # Fixed-width UTC text, so marks compare in time order as strings.
+    if update_time is None:
+        return None
+    return update_time.astimezone(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def user_document(email, user_data):
+    result = {
+        "email": email,
+        "name": user_data.get("name", "")
+    }
+    for key, value in user_data.items():
+        if key.startswith("semester_"):
+            result[key] = value
+    return result
+
+
+def _digest(course):
+    return hashlib.sha1(json.dumps(course, sort_keys=True).encode()).hexdigest()
+
+
+def document_digests(document):
+    # {"name", "semesters": {key: {"term", "courses": {name: [position, digest]}}}}
+    semesters = {}
+    for key, semester in document.items():
+        if not key.startswith("semester_"):
+            continue
+        courses = {}
+        for position, course in enumerate(semester.get("courses", [])):
+            courses[course.get("course_name", "")] = [position, _digest(course)]
+        semesters[key] = {"term": semester.get("term", ""), "courses": courses}
+    return {"name": document.get("name", ""), "semesters": semesters}
+
+
+def diff_documents(previous, current, document):
+    changes = {
+        "name": current["name"] if current["name"] != previous["name"] else None,
+        "semesters": [],
+        "removed_semesters": [key for key in previous["semesters"] if key not in current["semesters"]],
+        "courses": [],
+        "positions": [],
+        "removed_courses": []
+    }
+    for key, semester in current["semesters"].items():
+        before = previous["semesters"].get(key)
+        if before is None or before["term"] != semester["term"]:
+            changes["semesters"].append((key, semester["term"]))
+        before_courses = before["courses"] if before else {}
+        changes["removed_courses"].extend(
+            (key, name) for name in before_courses if name not in semester["courses"]
+        )
+        courses = {course.get("course_name", ""): course for course in document[key].get("courses", [])}
+        for name, (position, digest) in semester["courses"].items():
+            old = before_courses.get(name)
+            if old is None or old[1] != digest:
+                changes["courses"].append((key, position, courses[name]))
+            elif old[0] != position:
+                changes["positions"].append((key, name, position))
+    return changes
+
+
+# Mirrors Firestore user documents into the local UserDataStore. A sync
+# diffs the document against the digests saved by the previous sync and
+# writes only the semesters and courses that changed, with the document's
+# update time as a persisted high-water mark: an unchanged document costs
+# one read and no writes. Recently synced users are also watched with a
+# snapshot listener (at most max_watches, least recently synced dropped
+# first). Their changes are applied `debounce` seconds after the first
+# event, a burst collapsing into one write, and syncing a watched user who
+# is already up to date skips the Firestore read.
+class SyncManager:
+    def __init__(self, firebase_client, user_store, debounce=1.0, max_watches=100):
+        self.firebase_client = firebase_client
+        self.user_store = user_store
+        self.debounce = debounce
+        self.max_watches = max_watches
+        self._lock = threading.Lock()
+        self._user_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._watches = OrderedDict()
+        self._seen = {}
+        self._pending = {}
+        self._timers = {}
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+        self.unchanged = 0
+        self.skipped_reads = 0
+        self.courses_written = 0
+        self.courses_removed = 0
+        self.listener_events = 0
+        self.coalesced = 0
+
+    def sync(self, email):
+        with self._lock:
+            snapshot = self._pending.pop(email, None)
+            seen = self._seen.get(email)
+        if snapshot is None and seen is not None and seen == self.user_store.sync_state(email)[0]:
+            with self._lock:
+                self.skipped_reads += 1
+                self.unchanged += 1
+            result = {"status": "unchanged", "courses_written": 0, "courses_removed": 0}
+        else:
+            if snapshot is None:
+                snapshot = self.firebase_client.get_user_snapshot(email)
+            result = self.apply(email, snapshot)
+        if result["status"] != "missing":
+            self.watch(email)
+        return result
+
+    def apply(self, email, snapshot):
+        if not snapshot.exists:
+            return {"status": "missing", "courses_written": 0, "courses_removed": 0}
+        mark = sync_mark(snapshot.update_time)
+        with self._user_locks[hash(email) % LOCK_STRIPES]:
+            document = None
+            for _ in range(3):
+                base, previous = self.user_store.sync_state(email)
+                if base is not None and mark is not None and mark <= base:
+                    with self._lock:
+                        self.unchanged += 1
+                    return {"status": "unchanged", "courses_written": 0, "courses_removed": 0}
+                if base is None or mark is None:
+                    break
+                if document is None:
+                    document = user_document(email, snapshot.to_dict())
+                    digests = document_digests(document)
+                changes = diff_documents(previous, digests, document)
+                if self.user_store.apply_sync(email, base, mark, digests, changes):
+                    removed = len(changes["removed_courses"]) + sum(
+                        len(previous["semesters"][key]["courses"]) for key in changes["removed_semesters"]
+                    )
+                    with self._lock:
+                        self.incremental_syncs += 1
+                        self.courses_written += len(changes["courses"])
+                        self.courses_removed += removed
+                    return {"status": "updated", "courses_written": len(changes["courses"]), "courses_removed": removed}
+
+            if document is None:
+                document = user_document(email, snapshot.to_dict())
+                digests = document_digests(document)
+            self.user_store.put_user(document, mark, digests if mark is not None else None)
+            written = sum(len(semester["courses"]) for semester in digests["semesters"].values())
+            with self._lock:
+                self.full_syncs += 1
+                self.courses_written += written
+            return {"status": "replaced", "courses_written": written, "courses_removed": 0}
+
+    def watch(self, email):
+        if self.max_watches <= 0:
+            return
+        with self._lock:
+            if email in self._watches:
+                self._watches.move_to_end(email)
+                return
+            # Placeholder first: the listener may deliver its first snapshot
+            # before on_snapshot() returns.
+            self._watches[email] = None
+            evicted = []
+            while len(self._watches) > self.max_watches:
+                old_email, handle = self._watches.popitem(last=False)
+                self._forget(old_email)
+                evicted.append(handle)
+        for handle in evicted:
+            if handle is not None:
+                handle.unsubscribe()
+
+        try:
+            handle = self.firebase_client.watch_user(
+                email, lambda snapshots, changes, read_time: self._on_snapshot(email, snapshots)
+            )
+        except Exception as e:
+            with self._lock:
+                self._watches.pop(email, None)
+            report_error(f"Error watching {email}", e, route="sync")
+            return
+        with self._lock:
+            if email in self._watches:
+                self._watches[email] = handle
+                return
+        handle.unsubscribe()
+
+    def unwatch(self, email):
+        with self._lock:
+            handle = self._watches.pop(email, None)
+            self._forget(email)
+        if handle is not None:
+            handle.unsubscribe()
+
+    def close(self):
+        for email in list(self._watches):
+            self.unwatch(email)
+
+    def _forget(self, email):
+        self._seen.pop(email, None)
+        self._pending.pop(email, None)
+        timer = self._timers.pop(email, None)
+        if timer is not None:
+            timer.cancel()
+
+    def _on_snapshot(self, email, snapshots):
+        if not snapshots:
+            return
+        snapshot = snapshots[-1]
+        with self._lock:
+            if email not in self._watches:
+                return
+            self.listener_events += 1
+            self._seen[email] = sync_mark(snapshot.update_time) if snapshot.exists else None
+            if email in self._pending:
+                self.coalesced += 1
+            self._pending[email] = snapshot
+            if email not in self._timers:
+                timer = threading.Timer(self.debounce, self._flush, (email,))
+                timer.daemon = True
+                self._timers[email] = timer
+                timer.start()
+
+    def _flush(self, email):
+        with self._lock:
+            self._timers.pop(email, None)
+            snapshot = self._pending.pop(email, None)
+        if snapshot is None:
+            return
+        try:
+            self.apply(email, snapshot)
+        except Exception as e:
+            report_error(f"Error applying Firestore changes for {email}", e, route="sync")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "watching": len(self._watches),
+                "pending": len(self._pending),
+                "full_syncs": self.full_syncs,
+                "incremental_syncs": self.incremental_syncs,
+                "unchanged": self.unchanged,
+                "skipped_reads": self.skipped_reads,
+                "courses_written": self.courses_written,
+                "courses_removed": self.courses_removed,
+                "listener_events": self.listener_events,
+                "coalesced": self.coalesced
+            }
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other as top-level modules.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import FirebaseClient, GeminiClient, StudentAssistantAPI, StudentDataManager
+from fakes import FakeFirestore, FakeGenerativeModel
+from storage import UserDataStore
+
+
+def make_course(name, dates=("2025-02-01",), **fields):
+    return {
+        "course_name": name,
+        "instructor_name": f"{name} Instructor",
+        "marks_distribution": {"exam": 100},
+        "schedule": [{"date": date, "type": "exam", "title": f"{name} exam"} for date in dates],
+        **fields
+    }
+
+
+def make_document(email, courses=("CS 101", "MATH 201")):
+    return {
+        "name": "Test Student",
+        "semester_1": {"term": "Fall", "courses": [make_course(name) for name in courses]}
+    }
+
+
+@pytest.fixture
+def firestore():
+    return FakeFirestore()
+
+
+@pytest.fixture
+def firebase_client(firestore):
+    return FirebaseClient(db=firestore)
+
+
+@pytest.fixture
+def user_store(tmp_path):
+    return UserDataStore(str(tmp_path / "student_data.db"))
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch, firebase_client):
+    monkeypatch.setenv("STUDENT_DATA_FILE", str(tmp_path / "student_data.json"))
+    monkeypatch.setenv("STUDENT_DB_FILE", str(tmp_path / "student_data.db"))
+    monkeypatch.setenv("ANALYSIS_CACHE_FILE", str(tmp_path / "analysis_cache.db"))
+    api = StudentAssistantAPI(
+        gemini_client=GeminiClient(model=FakeGenerativeModel()),
+        student_data_manager=StudentDataManager(firebase_client)
+    )
+    yield api
+    api.student_data_manager.sync.close()
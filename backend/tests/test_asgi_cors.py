@@ -0,0 +1,45 @@
+import asyncio
+import json
+
+import pytest
+
+from asgi import AsyncStudentAssistantAPI
+
+CORS_NAMES = (b"access-control-allow-origin", b"access-control-expose-headers", b"vary")
+
+
+@pytest.fixture
+def asgi_app(api):
+    app = AsyncStudentAssistantAPI(api)
+    yield app
+    app.executor.shutdown()
+
+
+def cors_headers(app, method, path, body=b"", origin=None):
+    headers = [(b"content-type", b"application/json")]
+    if origin:
+        headers.append((b"origin", origin.encode()))
+    messages = [{"type": "http.request", "body": body}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # The client stays connected until the response is done.
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": b"", "headers": headers}
+    asyncio.run(app(scope, receive, send))
+    return sorted((name, value) for name, value in sent[0]["headers"] if name in CORS_NAMES)
+
+
+@pytest.mark.parametrize("origin", [None, "https://app.example.com"])
+def test_streamed_chat_matches_flask_cors_headers(asgi_app, origin):
+    flask_headers = cors_headers(asgi_app, "GET", "/api/health", origin=origin)
+    stream_headers = cors_headers(asgi_app, "POST", "/api/chat", json.dumps({"prompt": "hi"}).encode(), origin)
+
+    assert stream_headers == flask_headers
+    assert (b"access-control-expose-headers", b"ETag, X-Analysis-Cache, X-Request-ID") in stream_headers
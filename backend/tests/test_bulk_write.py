@@ -0,0 +1,61 @@
+from conftest import make_document
+
+
+def seed(firestore, email):
+    firestore.collection("user-data").document(email).set(make_document(email))
+
+
+def test_results_are_reported_per_item(firestore, firebase_client):
+    seed(firestore, "old@example.com")
+
+    result = firebase_client.bulk_write([
+        {"email": "new@example.com", "name": "New", "semesters": [{"semester_num": 1, "term_name": "Fall"}]},
+        {"name": "No Email"},
+        {"email": "ghost@example.com", "semesters": [{"semester_num": 1, "courses": []}]},
+        {"email": "old@example.com", "semesters": [{"semester_num": 7, "courses": []}]},
+        {"email": "old@example.com", "semesters": [{"semester_num": 1, "courses": [{"course_name": "X"}]}]},
+    ])
+
+    assert [(item["index"], item["success"]) for item in result["results"]] == [
+        (0, True), (1, False), (2, False), (3, False), (4, True)
+    ]
+    assert result["written"] == 2
+    assert not result["success"]
+    assert "Email is required" in result["results"][1]["message"]
+    assert "User ghost@example.com not found" in result["results"][2]["message"]
+    assert "Semester 7 not found" in result["results"][3]["message"]
+    assert "ghost@example.com" not in {email for _, email in firestore.documents}
+    assert firestore.documents[("user-data", "old@example.com")]["semester_1"]["courses"] == [{"course_name": "X"}]
+    assert firestore.commits == 1
+
+
+def test_update_may_follow_a_set_in_the_same_request(firestore, firebase_client):
+    result = firebase_client.bulk_write([
+        {"email": "new@example.com", "name": "New", "semesters": [{"semester_num": 1, "term_name": "Fall"}]},
+        {"email": "new@example.com", "semesters": [{"semester_num": 1, "courses": [{"course_name": "X"}]}]},
+    ])
+
+    assert result["success"]
+    assert firestore.documents[("user-data", "new@example.com")]["semester_1"] == {
+        "term": "Fall", "courses": [{"course_name": "X"}]
+    }
+
+
+def test_failed_batch_is_retried_write_by_write(firestore, firebase_client):
+    firestore.batch_limit = 1
+
+    result = firebase_client.bulk_write([
+        {"email": "a@example.com", "name": "A"},
+        {"email": "b@example.com", "name": "B"},
+    ])
+
+    assert result["success"]
+    assert result["written"] == 2
+    assert firestore.commits == 2
+
+
+def test_written_documents_are_cached(firestore, firebase_client):
+    firebase_client.bulk_write([{"email": "a@example.com", "name": "A"}])
+
+    assert firebase_client.fetch_data("a@example.com") == {"email": "a@example.com", "name": "A"}
+    assert firestore.reads == 0
@@ -0,0 +1,38 @@
+from events import UserEvents
+
+
+def course(name, start, end, dates):
+    return {
+        "course_name": name,
+        "start_time": start,
+        "end_time": end,
+        "schedule": [{"date": date, "type": "exam", "title": f"{name} {date}"} for date in dates]
+    }
+
+
+def clash_titles(document):
+    return [
+        (clash["date"], [event["title"] for event in clash["events"]])
+        for clash in UserEvents.from_document(document, 1).clashes()
+    ]
+
+
+def test_clashes_pair_overlapping_courses_on_the_same_day():
+    document = {
+        "semester_1": {"courses": [
+            course("A", "09:00 AM", "10:00 AM", ["2025-02-03", "2025-02-04"]),
+            course("B", "09:30 AM", "11:00 AM", ["2025-02-03"]),
+            course("C", "10:00 AM", "10:50 AM", ["2025-02-03", "2025-02-04"]),
+            course("D", "01:00 PM", "02:00 PM", ["2025-02-03"]),
+            course("E", "bad", "10:00 AM", ["2025-02-03"]),
+        ]},
+        "semester_2": {"courses": [
+            course("A", "09:00 AM", "10:00 AM", ["2025-02-03"]),
+        ]}
+    }
+
+    assert clash_titles(document) == [
+        ("2025-02-03", ["A 2025-02-03", "B 2025-02-03"]),
+        ("2025-02-03", ["A 2025-02-03", "B 2025-02-03"]),
+        ("2025-02-03", ["B 2025-02-03", "C 2025-02-03"]),
+    ]
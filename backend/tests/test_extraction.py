@@ -0,0 +1,126 @@
+import json
+import random
+
+import pytest
+
+from app import GeminiClient
+from extraction import JSONObjectScanner, extract_syllabus, validate_event
+from fakes import FakeGenerativeModel
+
+ANALYSIS = {
+    "course_name": "CS 101 Intro to \"Programming\" {and} [more]",
+    "instructor_name": "Dr. Escape \\ Backslash",
+    "start_time": "09:00 AM",
+    "end_time": "10:15 AM",
+    "marks_distribution": {"exam": 60, "assignments": "40%"},
+    "schedule": [
+        {"date": "2025-02-0%d" % day, "type": "assignment", "title": f"HW {day}", "description": "see {notes}, [1]"}
+        for day in range(1, 6)
+    ]
+}
+RESPONSE = "```json\n" + json.dumps(ANALYSIS, indent=2) + "\n```"
+
+
+def chunked(text, rng):
+    pieces = []
+    while text:
+        size = rng.randint(1, 40)
+        pieces.append(text[:size])
+        text = text[size:]
+    return pieces
+
+
+def scan(pieces):
+    scanner = JSONObjectScanner(stream_arrays=("schedule",))
+    items = []
+    for piece in pieces:
+        items.extend(scanner.feed(piece))
+    return scanner, items
+
+
+def test_scanner_reports_members_and_elements_as_they_close():
+    scanner, items = scan([RESPONSE])
+
+    assert scanner.done
+    assert ("field", "course_name", ANALYSIS["course_name"]) in items
+    assert ("field", "marks_distribution", ANALYSIS["marks_distribution"]) in items
+    assert [value for kind, key, value in items if kind == "item"] == ANALYSIS["schedule"]
+    assert not any(key == "schedule" for kind, key, _ in items if kind == "field")
+
+
+def test_scanner_is_independent_of_chunking():
+    _, expected = scan([RESPONSE])
+    rng = random.Random(0)
+    for _ in range(100):
+        scanner, items = scan(chunked(RESPONSE, rng))
+        assert scanner.done
+        assert items == expected
+
+
+def test_scanner_skips_malformed_elements():
+    text = '{"course_name": "X", "schedule": [{"date": "2025-01-01"}, {"date": 2025-01-02}, {"date": "2025-01-03"}]}'
+
+    _, items = scan(list(text))
+
+    assert [value["date"] for kind, _, value in items if kind == "item"] == ["2025-01-01", "2025-01-03"]
+    assert [kind for kind, _, _ in items].count("error") == 1
+
+
+def test_validate_event_drops_bad_dates_and_defaults_types():
+    assert validate_event({"date": "2025-13-01", "type": "exam"})[0] is None
+    event, problems = validate_event({"date": "2025-01-01", "type": "Seminar"})
+    assert event["type"] == "other"
+    assert problems
+
+
+def test_extract_syllabus_streams_items_then_analysis():
+    items = list(extract_syllabus(chunked(RESPONSE, random.Random(1))))
+
+    kind, analysis = items[-1]
+    assert kind == "analysis"
+    assert [data for kind, data in items if kind == "event"] == ANALYSIS["schedule"]
+    assert analysis["marks_distribution"] == {"exam": 60, "assignments": 40}
+    assert "partial" not in analysis
+    assert "warnings" not in analysis
+
+
+def test_truncated_response_returns_a_partial_analysis():
+    cut = RESPONSE.index('"HW 4"')
+
+    kind, analysis = list(extract_syllabus([RESPONSE[:cut]]))[-1]
+
+    assert analysis["partial"]
+    assert len(analysis["schedule"]) == 3
+    assert analysis["course_name"] == ANALYSIS["course_name"]
+
+
+def test_stream_error_keeps_what_was_extracted():
+    def chunks():
+        yield RESPONSE[:RESPONSE.index('"schedule"')]
+        raise ConnectionError("stream reset")
+
+    kind, analysis = list(extract_syllabus(chunks()))[-1]
+
+    assert analysis["partial"]
+    assert analysis["schedule"] == []
+    assert any("stream reset" in warning for warning in analysis["warnings"])
+
+
+def test_stream_error_before_any_data_is_raised():
+    def chunks():
+        yield "```json\n"
+        raise ConnectionError("stream reset")
+
+    with pytest.raises(ConnectionError):
+        list(extract_syllabus(chunks()))
+
+
+def test_gemini_client_extracts_from_the_model_stream():
+    model = FakeGenerativeModel(text=RESPONSE, chunks=23)
+    client = GeminiClient(model=model)
+
+    items = list(client.stream_syllabus_analysis(pdf_data=b"%PDF-1.4 test"))
+
+    assert model.calls == 1
+    assert [kind for kind, _ in items].count("event") == len(ANALYSIS["schedule"])
+    assert client.generate_syllabus_analysis(pdf_data=b"%PDF-1.4 test")["course_name"] == ANALYSIS["course_name"]
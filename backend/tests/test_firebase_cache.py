@@ -0,0 +1,121 @@
+from app import FirebaseClient
+from fakes import FakeFirestore
+
+from conftest import make_document
+
+
+def seed(firestore, email="a@example.com", document=None):
+    firestore.collection("user-data").document(email).set(document or make_document(email))
+    return email
+
+
+def test_fetch_data_reads_firestore_once(firestore, firebase_client):
+    email = seed(firestore)
+
+    first = firebase_client.fetch_data(email)
+    second = firebase_client.fetch_data(email)
+
+    assert first == second
+    assert first["email"] == email
+    assert firestore.reads == 1
+    assert firebase_client.cache_stats()["hits"] == 1
+
+
+def test_missing_user_is_cached(firestore, firebase_client):
+    assert firebase_client.fetch_data("nobody@example.com") is None
+    assert firebase_client.fetch_data("nobody@example.com") is None
+    assert firestore.reads == 1
+
+
+def test_save_user_writes_through(firestore, firebase_client):
+    firebase_client.save_user("new@example.com", "New Student")
+
+    assert firebase_client.fetch_data("new@example.com") == {"email": "new@example.com", "name": "New Student"}
+    assert firestore.reads == 0
+
+
+def test_add_semester_updates_cached_document(firestore, firebase_client):
+    email = seed(firestore)
+    firebase_client.fetch_data(email)
+
+    firebase_client.add_semester(email, 2, "Spring")
+
+    data = firebase_client.fetch_data(email)
+    assert data["semester_2"] == {"term": "Spring", "courses": []}
+    assert data["semester_1"]["term"] == "Fall"
+    assert firestore.reads == 1
+
+
+def test_add_courses_checks_semester_against_cache(firestore, firebase_client):
+    email = seed(firestore)
+    firebase_client.fetch_data(email)
+    courses = [{"course_name": "PHYS 110"}]
+
+    assert firebase_client.add_courses(email, 1, courses)["success"]
+    assert not firebase_client.add_courses(email, 9, courses)["success"]
+
+    assert firebase_client.fetch_data(email)["semester_1"]["courses"] == courses
+    assert firestore.documents[("user-data", email)]["semester_1"]["courses"] == courses
+    assert firestore.reads == 1
+
+
+def test_version_follows_firestore_update_time(firestore, firebase_client):
+    email = seed(firestore)
+    _, version = firebase_client.fetch_versioned_data(email)
+
+    assert firebase_client.fetch_versioned_data(email)[1] == version
+
+    firebase_client.add_semester(email, 2, "Spring")
+    _, written = firebase_client.fetch_versioned_data(email)
+    assert written != version
+
+    # A fresh read of the same document gives the version the write did.
+    firebase_client.cache.clear()
+    assert firebase_client.fetch_versioned_data(email)[1] == written
+
+
+def test_least_recently_used_documents_are_evicted(monkeypatch):
+    monkeypatch.setenv("FIRESTORE_CACHE_SIZE", "2")
+    firestore = FakeFirestore()
+    firebase_client = FirebaseClient(db=firestore)
+    emails = [seed(firestore, f"user{i}@example.com") for i in range(3)]
+
+    for email in emails:
+        firebase_client.fetch_data(email)
+    firebase_client.fetch_data(emails[2])
+    firebase_client.fetch_data(emails[0])
+
+    assert firestore.reads == 4
+    assert firebase_client.cache_stats()["evictions"] == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch, firestore, firebase_client):
+    email = seed(firestore)
+    now = [0.0]
+    monkeypatch.setattr(firebase_client.cache, "clock", lambda: now[0])
+    firebase_client.cache.ttl = 10
+
+    firebase_client.fetch_data(email)
+    now[0] = 5
+    firebase_client.fetch_data(email)
+    now[0] = 20
+    firebase_client.fetch_data(email)
+
+    assert firestore.reads == 2
+
+
+def test_add_semester_does_not_revive_an_expired_document(monkeypatch, firestore, firebase_client):
+    email = seed(firestore)
+    now = [0.0]
+    monkeypatch.setattr(firebase_client.cache, "clock", lambda: now[0])
+    firebase_client.cache.ttl = 10
+    firebase_client.fetch_data(email)
+
+    # Another worker writes while this worker's copy expires.
+    FirebaseClient(db=firestore).add_courses(email, 1, [{"course_name": "X"}])
+    now[0] = 20
+    firebase_client.add_semester(email, 2, "Spring")
+
+    data = firebase_client.fetch_data(email)
+    assert data["semester_1"]["courses"] == [{"course_name": "X"}]
+    assert data["semester_2"] == {"term": "Spring", "courses": []}
@@ -0,0 +1,117 @@
+import pytest
+
+from grades import GradeEngine, score_percent
+
+
+def grade_course(engine=None, target=None, what_if=None, **fields):
+    course = {
+        "course_name": "CS 101",
+        "marks_distribution": {"exam": 50, "assignments": 30, "quiz": 20},
+        **fields
+    }
+    return (engine or GradeEngine()).compute(
+        lambda: {"name": "Test Student", "semester_1": {"courses": [course]}},
+        target=target, what_if=what_if
+    )["courses"][0]
+
+
+@pytest.mark.parametrize("marks, expected", [
+    (85, 85.0),
+    ("85", 85.0),
+    (" 85% ", 85.0),
+    ("42/50", 84.0),
+    ({"score": "42", "max": "50"}, 84.0),
+    ([80, "90%", {"score": 7, "out_of": 10}], 80.0),
+    ([], None),
+])
+def test_score_percent_reads_numbers_percentages_and_fractions(marks, expected):
+    assert score_percent(marks) == expected
+
+
+@pytest.mark.parametrize("marks", ["A-", "5/0", {"score": "n/a"}, True])
+def test_score_percent_rejects_non_numbers(marks):
+    with pytest.raises(ValueError):
+        score_percent(marks)
+
+
+def test_current_grade_is_weighted_over_graded_categories():
+    grades = grade_course(current_marks={"exam": 90, "assignments": "70%"})
+
+    assert grades["current_grade"] == 82.5
+    assert grades["letter"] == "B"
+    assert grades["earned_points"] == 66.0
+    assert grades["graded_weight"] == 80.0
+    assert grades["remaining_weight"] == 20.0
+    assert grades["max_possible_grade"] == 86.0
+    assert "warnings" not in grades
+
+
+def test_string_weights_are_accepted():
+    grades = grade_course(
+        marks_distribution={"exam": "60%", "assignments": " 40 "},
+        current_marks={"exam": "85/100", "assignments": 95}
+    )
+
+    assert grades["total_weight"] == 100.0
+    assert grades["current_grade"] == 89.0
+
+
+def test_unreadable_values_are_skipped_with_a_warning():
+    grades = grade_course(
+        marks_distribution={"exam": 50, "assignments": "thirty", "quiz": 20},
+        current_marks={"exam": 80, "quiz": "A-"}
+    )
+
+    assert grades["total_weight"] == 70.0
+    assert grades["current_grade"] == 80.0
+    assert grades["remaining_weight"] == 20.0
+    assert len(grades["warnings"]) == 2
+    assert "'thirty'" in grades["warnings"][0]
+    assert "'A-'" in grades["warnings"][1]
+
+
+def test_needed_for_target_covers_the_remaining_weight():
+    grades = grade_course(target=85, current_marks={"exam": 90, "assignments": 70})
+
+    assert grades["needed_for_target"] == 95.0
+    assert grades["target_reachable"]
+
+    grades = grade_course(target=90, current_marks={"exam": 90, "assignments": 70})
+    assert grades["needed_for_target"] == 120.0
+    assert grades["target_reachable"] is False
+
+
+def test_needed_for_target_when_fully_graded():
+    marks = {"exam": 90, "assignments": 80, "quiz": 70}
+
+    assert grade_course(target=80, current_marks=marks)["needed_for_target"] == 0.0
+    grades = grade_course(target=90, current_marks=marks)
+    assert grades["needed_for_target"] is None
+    assert grades["target_reachable"] is False
+
+
+def test_what_if_marks_override_current_marks():
+    grades = grade_course(
+        target=85,
+        current_marks={"exam": 60, "assignments": 70},
+        what_if={"CS 101": {"exam": 90, "quiz": "100%"}}
+    )
+
+    assert grades["current_grade"] == 86.0
+    assert grades["remaining_weight"] == 0.0
+    assert grades["needed_for_target"] == 0.0
+
+
+def test_memoized_results_skip_the_loader():
+    engine = GradeEngine()
+    loads = []
+
+    def load():
+        loads.append(1)
+        return {"semester_1": {"courses": [{"course_name": "CS 101", "marks_distribution": {"exam": 100}}]}}
+
+    first = engine.compute(load, key=("a@example.com", 1), target=80)
+    assert engine.compute(load, key=("a@example.com", 1), target=80) == first
+    engine.compute(load, key=("a@example.com", 1), target=80, what_if={"CS 101": {"exam": 70}})
+
+    assert len(loads) == 2
@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+
+from jobs import JobQueue, JobQueueFull
+
+
+class BlockingRunner:
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, value):
+        self.calls.append(value)
+        self.release.wait(2)
+        if value == "bad":
+            raise ValueError("cannot analyze bad")
+        return {"analyzed": value}
+
+
+@pytest.fixture
+def runner():
+    return BlockingRunner()
+
+
+@pytest.fixture
+def queue(runner):
+    jobs = JobQueue(runner, max_workers=2, max_pending=2)
+    yield jobs
+    runner.release.set()
+    jobs.shutdown()
+
+
+def wait_until_finished(queue, job):
+    queue.runner.release.set()
+    queue.shutdown()
+    return queue.get(job.id)
+
+
+def test_in_flight_keys_share_one_job(queue, runner):
+    first = queue.submit("syllabus-1", "a")
+    second = queue.submit("syllabus-1", "a")
+
+    assert second is first
+    assert queue.stats()["deduplicated"] == 1
+    job = wait_until_finished(queue, first)
+    assert job.to_dict()["result"] == {"analyzed": "a"}
+    assert runner.calls == ["a"]
+
+
+def test_finished_key_starts_a_new_job(queue):
+    first = queue.completed("syllabus-1", {"analyzed": "a"})
+
+    assert queue.submit("syllabus-1", "a") is not first
+
+
+def test_submit_raises_when_max_pending_jobs_are_in_flight(queue):
+    queue.submit("syllabus-1", "a")
+    queue.submit("syllabus-2", "b")
+
+    with pytest.raises(JobQueueFull):
+        queue.submit("syllabus-3", "c")
+    assert queue.stats()["rejected"] == 1
+    assert queue.stats()["pending"] == 2
+
+
+def test_failed_job_reports_its_error(queue):
+    job = wait_until_finished(queue, queue.submit("syllabus-1", "bad"))
+
+    assert job.to_dict()["status"] == "failed"
+    assert job.to_dict()["error"] == "cannot analyze bad"
+    assert "result" not in job.to_dict()
+    assert queue.stats()["pending"] == 0
+
+
+def test_old_jobs_are_pruned_after_retention(queue):
+    old = queue.completed("syllabus-1", {"analyzed": "a"})
+    old.finished_at -= queue.retention + 1
+    recent = queue.completed("syllabus-2", {"analyzed": "b"})
+
+    assert queue.get(old.id) is None
+    assert queue.get(recent.id) is recent
+
+
+def test_at_most_max_finished_jobs_are_kept(runner):
+    queue = JobQueue(runner, max_finished=2)
+    jobs = [queue.completed(f"syllabus-{i}", {"analyzed": i}) for i in range(3)]
+
+    assert queue.get(jobs[0].id) is None
+    assert [queue.get(job.id) for job in jobs[1:]] == jobs[1:]
+    assert queue.stats()["jobs"] == {"done": 2}
+    queue.shutdown()
@@ -0,0 +1,61 @@
+import asyncio
+
+from metrics import CALLS_IN_FLIGHT, REGISTRY, instrumented
+
+
+@instrumented("test_client")
+class Streams:
+    def numbers(self, n):
+        yield from range(n)
+
+    async def async_numbers(self, n):
+        for i in range(n):
+            yield i
+
+
+def in_flight(method):
+    return CALLS_IN_FLIGHT._values.get(("test_client", method), 0)
+
+
+def test_streams_count_in_flight_only_while_iterated():
+    streams = Streams()
+
+    unused = streams.numbers(3)
+    assert in_flight("numbers") == 0
+    del unused
+
+    stream = streams.numbers(3)
+    assert next(stream) == 0
+    assert in_flight("numbers") == 1
+    assert list(stream) == [1, 2]
+    assert in_flight("numbers") == 0
+
+
+def test_async_streams_count_in_flight_only_while_iterated():
+    streams = Streams()
+    streams.async_numbers(3)
+    assert in_flight("async_numbers") == 0
+
+    async def consume():
+        return [i async for i in streams.async_numbers(3)]
+
+    assert asyncio.run(consume()) == [0, 1, 2]
+    assert in_flight("async_numbers") == 0
+
+
+def test_response_cache_lookups_are_exported(api):
+    client = api.app.test_client()
+
+    def lookups(result):
+        for line in REGISTRY.render().splitlines():
+            if line.startswith(f'studysync_response_cache_lookups_total{{result="{result}"}}'):
+                return int(line.split()[-1])
+        return 0
+
+    hits, misses = lookups("hit"), lookups("miss")
+    for _ in range(2):
+        client.post("/api/chat", json={"prompt": "What is a syllabus?", "no_stream": True})
+
+    assert lookups("miss") == misses + 1
+    assert lookups("hit") == hits + 1
+    assert "studysync_response_cache_lookups_total" in client.get("/metrics").get_data(as_text=True)
@@ -0,0 +1,156 @@
+import threading
+
+import pytest
+from google.api_core.exceptions import InvalidArgument, TooManyRequests
+
+from fakes import FakeGenerativeModel
+from scheduler import RequestScheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def scheduler(clock, **options):
+    return RequestScheduler(clock=clock, sleep=clock.sleep, **options)
+
+
+def text(chunks):
+    return "".join(chunk.text for chunk in chunks)
+
+
+def test_retryable_errors_are_retried_with_capped_backoff(clock):
+    model = FakeGenerativeModel(text="ok", errors=[TooManyRequests("slow down")] * 3)
+    requests = scheduler(clock, max_retries=3, base_delay=1.0, max_delay=2.0)
+
+    assert requests.call(model.generate_content, "hi").text == "ok"
+
+    assert model.calls == 4
+    assert requests.retries == 3
+    assert len(clock.sleeps) == 3
+    for attempt, delay in enumerate(clock.sleeps):
+        assert 0 <= delay <= min(2.0, 1.0 * 2 ** attempt)
+
+
+def test_retries_stop_after_max_retries(clock):
+    model = FakeGenerativeModel(errors=[TooManyRequests("slow down")] * 3)
+    requests = scheduler(clock, max_retries=2)
+
+    with pytest.raises(TooManyRequests):
+        requests.call(model.generate_content, "hi")
+
+    assert model.calls == 3
+    assert len(clock.sleeps) == 2
+    assert requests.active == 0
+
+
+def test_other_errors_are_not_retried(clock):
+    model = FakeGenerativeModel(errors=[InvalidArgument("bad prompt")])
+    requests = scheduler(clock)
+
+    with pytest.raises(InvalidArgument):
+        requests.call(model.generate_content, "hi")
+
+    assert model.calls == 1
+    assert clock.sleeps == []
+
+
+def test_stream_retries_before_the_first_chunk(clock):
+    model = FakeGenerativeModel(text="streamed text", errors=[TooManyRequests("slow down")])
+    requests = scheduler(clock)
+
+    assert text(requests.stream(model.generate_content, "hi", stream=True)) == "streamed text"
+
+    assert model.calls == 2
+    assert requests.retries == 1
+    assert requests.active == 0
+
+
+def test_stream_does_not_retry_after_the_first_chunk(clock):
+    calls = []
+
+    def generate():
+        calls.append(1)
+        yield "first"
+        raise TooManyRequests("slow down")
+
+    requests = scheduler(clock)
+    chunks = requests.stream(generate)
+
+    assert next(chunks) == "first"
+    with pytest.raises(TooManyRequests):
+        next(chunks)
+    assert len(calls) == 1
+    assert requests.retries == 0
+    assert requests.active == 0
+
+
+def test_concurrent_calls_with_a_key_share_one_request(clock):
+    release = threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        release.wait(2)
+        return "shared"
+
+    requests = scheduler(clock)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(requests.call(generate, key="prompt")))
+               for _ in range(4)]
+    threads[0].start()
+    while not calls:
+        release.wait(0.001)
+    for thread in threads[1:]:
+        thread.start()
+    while requests.coalesced < 3:
+        release.wait(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["shared"] * 4
+    assert len(calls) == 1
+    assert requests.call(generate, key="prompt") == "shared"
+    assert len(calls) == 2
+
+
+def test_failed_keyed_call_frees_the_key(clock):
+    model = FakeGenerativeModel(errors=[InvalidArgument("bad prompt")])
+    requests = scheduler(clock)
+
+    with pytest.raises(InvalidArgument):
+        requests.call(model.generate_content, "hi", key="prompt")
+
+    assert requests.call(model.generate_content, "hi", key="prompt").text == model.text
+    assert model.calls == 2
+
+
+def test_token_bucket_throttles_call_starts(clock):
+    model = FakeGenerativeModel()
+    requests = scheduler(clock, rate=2, burst=2)
+
+    for _ in range(4):
+        requests.call(model.generate_content, "hi")
+
+    assert clock.sleeps == [0.5, 0.5]
+    assert requests.throttled == 2
+
+    clock.now += 10
+    requests.call(model.generate_content, "hi")
+    requests.call(model.generate_content, "hi")
+    assert len(clock.sleeps) == 2
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import threading
+import time
+
+from streaming import async_sse_stream, sse_stream
+
+
+def parse(message):
+    if message.startswith(":"):
+        return "heartbeat", None
+    event, data = message.strip().split("\n")
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+
+def fake_clock(*times):
+    return iter(times).__next__
+
+
+def collect_async(stream):
+    async def run():
+        return [parse(message) async for message in stream]
+
+    return asyncio.run(run())
+
+
+async def async_chunks(texts, delay=0.0, error=None):
+    for text in texts:
+        if delay:
+            await asyncio.sleep(delay)
+        yield text
+    if error is not None:
+        raise error
+
+
+def slow_chunks(texts, delay):
+    for text in texts:
+        time.sleep(delay)
+        yield text
+
+
+def test_start_goes_out_before_the_first_chunk():
+    stream = sse_stream(slow_chunks(["late"], 0.2), heartbeat_interval=5)
+
+    started = time.monotonic()
+    assert parse(next(stream)) == ("start", {"status": "started"})
+    assert time.monotonic() - started < 0.1
+    stream.close()
+
+
+def test_complete_event_reports_timing_and_extra_fields():
+    stream = sse_stream(iter(["a", "b"]), complete_fields={"model": "fake"}, clock=fake_clock(10.0, 10.25, 11.0))
+
+    events = [parse(message) for message in stream]
+
+    assert events == [
+        ("start", {"status": "started"}),
+        ("chunk", {"chunk": "a"}),
+        ("chunk", {"chunk": "b"}),
+        ("complete", {"status": "complete", "chunks": 2, "ttft_ms": 250.0, "duration_ms": 1000.0, "model": "fake"}),
+    ]
+
+
+def test_heartbeat_is_sent_while_the_upstream_is_silent():
+    events = [parse(message) for message in sse_stream(slow_chunks(["a"], 0.1), heartbeat_interval=0.02)]
+
+    assert ("heartbeat", None) in events[1:events.index(("chunk", {"chunk": "a"}))]
+    assert events[-1][0] == "complete"
+
+
+def test_upstream_error_ends_the_stream_with_an_error_event():
+    def chunks():
+        yield "a"
+        raise ConnectionError("stream reset")
+
+    events = [parse(message) for message in sse_stream(chunks())]
+
+    assert events[1:] == [("chunk", {"chunk": "a"}), ("error", {"error": "stream reset"})]
+
+
+def test_closing_the_stream_closes_the_upstream():
+    closed = threading.Event()
+
+    def chunks():
+        try:
+            while True:
+                time.sleep(0.01)
+                yield "a"
+        finally:
+            closed.set()
+
+    stream = sse_stream(chunks())
+    next(stream)
+    assert parse(next(stream)) == ("chunk", {"chunk": "a"})
+    stream.close()
+
+    assert closed.wait(2)
+
+
+def test_async_stream_sends_start_heartbeat_and_complete():
+    stream = async_sse_stream(
+        async_chunks(["a", "b"], delay=0.05), heartbeat_interval=0.01,
+        complete_fields={"model": "fake"}, clock=fake_clock(10.0, 10.25, 11.0)
+    )
+
+    events = collect_async(stream)
+
+    assert events[0] == ("start", {"status": "started"})
+    assert ("heartbeat", None) in events
+    assert [data for event, data in events if event == "chunk"] == [{"chunk": "a"}, {"chunk": "b"}]
+    assert events[-1] == (
+        "complete", {"status": "complete", "chunks": 2, "ttft_ms": 250.0, "duration_ms": 1000.0, "model": "fake"}
+    )
+
+
+def test_async_upstream_error_ends_the_stream_with_an_error_event():
+    events = collect_async(async_sse_stream(async_chunks(["a"], error=ConnectionError("stream reset"))))
+
+    assert events[1:] == [("chunk", {"chunk": "a"}), ("error", {"error": "stream reset"})]
+
+
+def test_closing_the_async_stream_closes_the_upstream():
+    closed = []
+
+    async def chunks():
+        try:
+            yield "a"
+            await asyncio.sleep(10)
+            yield "b"
+        finally:
+            closed.append(True)
+
+    async def run():
+        stream = async_sse_stream(chunks(), heartbeat_interval=0.01)
+        events = [parse(await anext(stream)) for _ in range(3)]
+        await stream.aclose()
+        return events
+
+    assert asyncio.run(run()) == [("start", {"status": "started"}), ("chunk", {"chunk": "a"}), ("heartbeat", None)]
+    assert closed == [True]
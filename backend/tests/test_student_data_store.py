@@ -0,0 +1,52 @@
+import json
+import os
+import stat
+
+import pytest
+
+from storage import StudentDataStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / "student_data.json"
+    path.write_text(json.dumps({"name": "Test Student"}))
+    os.chmod(path, 0o664)
+    return StudentDataStore(str(path))
+
+
+def add_semester(data):
+    data["semester_1"] = {"term": "Fall", "courses": []}
+    return {"success": True}
+
+
+def test_update_keeps_the_file_mode(store):
+    store.update(add_semester)
+
+    assert stat.S_IMODE(os.stat(store.path).st_mode) == 0o664
+    assert store.load()["semester_1"]["term"] == "Fall"
+
+
+def test_error_result_is_not_committed(store):
+    before = os.stat(store.path)
+
+    def refuse(data):
+        data["partial"] = True
+        return {"error": "Semester 9 not found in student data"}
+
+    assert store.update(refuse) == {"error": "Semester 9 not found in student data"}
+    after = os.stat(store.path)
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+    assert "partial" not in store.load()
+
+
+def test_failed_mutator_does_not_undo_the_others(store):
+    def fail(data):
+        data["partial"] = True
+        raise ValueError("bad update")
+
+    store.update(add_semester)
+    with pytest.raises(ValueError):
+        store.update(fail)
+
+    assert store.load() == {"name": "Test Student", "semester_1": {"term": "Fall", "courses": []}}
@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+from sync import SyncManager
+
+from conftest import make_course, make_document
+
+EMAIL = "a@example.com"
+
+
+@pytest.fixture
+def document(firestore):
+    reference = firestore.collection("user-data").document(EMAIL)
+    reference.set(make_document(EMAIL, courses=("CS 101", "MATH 201", "HIST 110")))
+    return reference
+
+
+@pytest.fixture
+def sync(firebase_client, user_store):
+    manager = SyncManager(firebase_client, user_store, debounce=0.01, max_watches=0)
+    yield manager
+    manager.close()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+def local_courses(user_store):
+    return [course["course_name"] for course in user_store.get_user(EMAIL)["semester_1"]["courses"]]
+
+
+def test_first_sync_copies_the_document(document, sync, user_store):
+    result = sync.sync(EMAIL)
+
+    assert result["status"] == "replaced"
+    assert result["courses_written"] == 3
+    assert user_store.get_user(EMAIL)["semester_1"]["courses"][0] == make_course("CS 101")
+
+
+def test_unchanged_document_writes_nothing(document, sync, user_store):
+    sync.sync(EMAIL)
+    version = user_store.version(EMAIL)
+
+    assert sync.sync(EMAIL)["status"] == "unchanged"
+    assert user_store.version(EMAIL) == version
+
+
+def test_only_changed_courses_are_written(document, sync, user_store):
+    sync.sync(EMAIL)
+    changed = make_course("MATH 201", dates=("2025-03-01", "2025-03-08"))
+    document.update({"semester_1.courses": [make_course("CS 101"), changed]})
+
+    result = sync.sync(EMAIL)
+
+    assert result == {"status": "updated", "courses_written": 1, "courses_removed": 1}
+    assert local_courses(user_store) == ["CS 101", "MATH 201"]
+    assert user_store.get_user(EMAIL)["semester_1"]["courses"][1] == changed
+
+
+def test_semesters_and_name_changes_are_applied(document, sync, user_store):
+    sync.sync(EMAIL)
+    document.update({"name": "Renamed", "semester_2": {"term": "Spring", "courses": [make_course("BIO 100")]}})
+
+    assert sync.sync(EMAIL)["status"] == "updated"
+    data = user_store.get_user(EMAIL)
+    assert data["name"] == "Renamed"
+    assert data["semester_2"]["courses"] == [make_course("BIO 100")]
+
+
+def test_local_write_forces_a_full_replace(document, sync, user_store):
+    sync.sync(EMAIL)
+    user_store.upsert_courses(EMAIL, [make_course("LOCAL 1")], "semester_1")
+
+    assert sync.sync(EMAIL)["status"] == "replaced"
+    assert local_courses(user_store) == ["CS 101", "MATH 201", "HIST 110"]
+
+
+def test_missing_user_is_reported(sync, user_store):
+    assert sync.sync("nobody@example.com")["status"] == "missing"
+    assert user_store.get_user("nobody@example.com") is None
+
+
+def test_listener_applies_changes_and_skips_reads(firestore, firebase_client, user_store, document):
+    sync = SyncManager(firebase_client, user_store, debounce=0.01, max_watches=10)
+    try:
+        sync.sync(EMAIL)
+        document.update({"semester_1.courses": [make_course("CS 101")]})
+        wait_for(lambda: local_courses(user_store) == ["CS 101"])
+
+        reads = firestore.reads
+        assert sync.sync(EMAIL)["status"] == "unchanged"
+        assert firestore.reads == reads
+        assert sync.stats()["skipped_reads"] == 1
+    finally:
+        sync.close()
+
+
+def test_sync_data_reaches_clients_without_an_email(api, document):
+    client = api.app.test_client()
+
+    assert client.post("/api/sync_data", json={"email": EMAIL}).get_json()["success"]
+
+    data = client.get("/api/get_student_data").get_json()
+    assert data == client.get(f"/api/get_student_data?email={EMAIL}").get_json()
+    assert [course["course_name"] for course in data["semester_1"]["courses"]] == ["CS 101", "MATH 201", "HIST 110"]
@@ -0,0 +1,57 @@
+import hashlib
+import io
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+PDF_MAGIC = b"%PDF-"
+DEFAULT_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+
+class UploadBuffer(io.BytesIO):
+    def __init__(self, max_bytes):
+        super().__init__()
+        self.max_bytes = max_bytes
+
+    def write(self, data):
+        if self.tell() + len(data) > self.max_bytes:
+            raise RequestEntityTooLarge(f"Uploaded file exceeds {self.max_bytes} bytes")
+        return super().write(data)
+
+
+# Keeps multipart file parts in memory instead of werkzeug's default spooled
+# temp files, and stops parsing as soon as one part grows past
+# MAX_UPLOAD_BYTES.
+class BufferedUploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        max_bytes = current_app.config.get("MAX_UPLOAD_BYTES", DEFAULT_MAX_UPLOAD_BYTES)
+        if content_length is not None and content_length > max_bytes:
+            raise RequestEntityTooLarge(f"Uploaded file exceeds {max_bytes} bytes")
+        return UploadBuffer(max_bytes)
+
+
+class InvalidUpload(ValueError):
+    pass
+
+
+def read_pdf_upload(file, chunk_size=64 * 1024):
+    stream = file.stream
+    hasher = hashlib.sha256()
+
+    if isinstance(stream, io.BytesIO):
+        with stream.getbuffer() as view:
+            if bytes(view[:len(PDF_MAGIC)]) != PDF_MAGIC:
+                raise InvalidUpload("File is not a valid PDF")
+            hasher.update(view)
+        return stream.getvalue(), hasher.hexdigest()
+
+    stream.seek(0)
+    parts = []
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        if not parts and not chunk.startswith(PDF_MAGIC):
+            raise InvalidUpload("File is not a valid PDF")
+        hasher.update(chunk)
+        parts.append(chunk)
+    if not parts:
+        raise InvalidUpload("File is not a valid PDF")
+    return b"".join(parts), hasher.hexdigest()
@@ -42,6 +42,7 @@ export default function ChatPanel({ isOpen, onToggle }: ChatPanelProps) {
   const [input, setInput] = useState("")
   const [isLoading, setIsLoading] = useState(false)
   const messagesEndRef = useRef<HTMLDivElement>(null)
+  const sessionIdRef = useRef<string>(`${Date.now()}-${Math.random().toString(36).slice(2)}`)
   const [mounted, setMounted] = useState(false)
   const [selectedFile, setSelectedFile] = useState<File | null>(null)
   const [showFileUpload, setShowFileUpload] = useState(false)
@@ -80,7 +81,7 @@ export default function ChatPanel({ isOpen, onToggle }: ChatPanelProps) {
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ prompt: input }),
+        body: JSON.stringify({ prompt: input, session_id: sessionIdRef.current }),
       })
 
       if (!response.ok) {
@@ -174,7 +175,21 @@ export default function ChatPanel({ isOpen, onToggle }: ChatPanelProps) {
         throw new Error('Failed to analyze syllabus')
       }
 
-      const result = await response.json()
+      let job = await response.json()
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 1000))
+        const jobResponse = await fetch(`${process.env.NEXT_PUBLIC_API_URL || 'http://localhost:5000'}/api/syllabus_jobs/${job.job_id}`)
+        if (!jobResponse.ok) {
+          throw new Error('Failed to check syllabus analysis status')
+        }
+        job = await jobResponse.json()
+      }
+
+      if (job.status !== 'done') {
+        throw new Error(job.error || 'Failed to analyze syllabus')
+      }
+
+      const result = job.result
       setEditedPdfData(result)
       setShowPdfDataDialog(true)
       